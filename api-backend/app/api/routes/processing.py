@@ -35,6 +35,31 @@ async def get_job_status(job_id: str):
         "result": job_data.get("result")
     }
 
+@router.get("/processing/jobs/{job_id}/wait")
+async def wait_for_job_status(
+    job_id: str,
+    status: Optional[str] = Query(None),
+    timeout: float = Query(30.0, gt=0, le=60)
+):
+    """Long-poll until the job status differs from `status` (or the timeout expires)"""
+    
+    job_data = await queue_service.wait_for_job_update(job_id, since_status=status, timeout=timeout)
+    if not job_data:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job_id,
+        "status": job_data["status"],
+        "document_id": job_data["document_id"],
+        "document_type": job_data["document_type"],
+        "created_at": job_data["created_at"],
+        "started_at": job_data.get("started_at"),
+        "completed_at": job_data.get("completed_at"),
+        "retry_count": job_data["retry_count"],
+        "error_message": job_data.get("error_message"),
+        "result": job_data.get("result")
+    }
+
 @router.get("/processing/queue/stats")
 async def get_queue_statistics():
     """Get processing queue statistics"""
@@ -4,6 +4,7 @@ Redis-based processing queue service
 
 import json
 import uuid
+import asyncio
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
@@ -14,6 +15,9 @@ from ..core.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Job states after which no further updates are published
+TERMINAL_JOB_STATUSES = ("completed", "failed")
+
 @dataclass
 class ProcessingJob:
     """Processing job data structure"""
@@ -53,6 +57,9 @@ class QueueService:
         
         # Metrics keys
         self.metrics_prefix = "mdus:metrics:"
+        
+        # Pub/sub channel prefix for job state changes
+        self.job_events_prefix = "mdus:job_events:"
     
     def _get_redis(self):
         """Get Redis client"""
@@ -208,6 +215,43 @@ class QueueService:
         
         return asdict(job_data)
     
+    async def wait_for_job_update(self,
+                                  job_id: str,
+                                  since_status: Optional[str] = None,
+                                  timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """Block until the job leaves `since_status` or the timeout expires"""
+        
+        redis = self._get_redis()
+        pubsub = redis.pubsub()
+        
+        # Subscribe before reading the current state so no transition is missed
+        await pubsub.subscribe(f"{self.job_events_prefix}{job_id}")
+        try:
+            job_data = await self.get_job_status(job_id)
+            if not job_data:
+                return None
+            
+            if since_status is None:
+                since_status = job_data["status"]
+            if job_data["status"] != since_status or job_data["status"] in TERMINAL_JOB_STATUSES:
+                return job_data
+            
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while (remaining := deadline - loop.time()) > 0:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=remaining
+                )
+                if message is not None and message["data"] != since_status:
+                    return await self.get_job_status(job_id)
+            
+            return job_data
+        
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+    
     async def get_queue_stats(self) -> Dict[str, int]:
         """Get queue statistics"""
         
@@ -311,6 +355,9 @@ class QueueService:
             timedelta(hours=24).total_seconds(),
             json.dumps(asdict(job))
         )
+        
+        # Wake up any long-polling status waiters
+        await redis.publish(f"{self.job_events_prefix}{job.job_id}", job.status)
     
     async def _update_metrics(self, metric_name: str, value: int):
         """Update processing metrics"""
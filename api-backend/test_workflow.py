@@ -4,13 +4,18 @@ Tests the complete workflow: upload → process → store results
 """
 
 import asyncio
-import aiohttp
 import json
+import random
 import time
-import tempfile
+from collections import Counter
 from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson
+except ImportError:  # optional, falls back to stdlib json
+    orjson = None
+
 # Test configuration
 API_BASE_URL = "http://localhost:8000/api/v1"
 TEST_FILES = [
@@ -26,6 +31,19 @@ TEST_FILES = [
     }
 ]
 
+# Job status long-polling: per-request server wait and overall budget (seconds)
+JOB_WAIT_POLL_TIMEOUT = 30
+JOB_STATUS_TIMEOUT = 120
+TERMINAL_JOB_STATUSES = ("completed", "failed")
+JOB_POLL_MIN_DELAY = 0.05
+JOB_POLL_MAX_DELAY = 1.0
+
+# Form fields shared by every upload request
+FIXED_UPLOAD_FIELDS = (
+    ('user_id', '1'),
+    ('is_sensitive', 'true'),
+)
+
 class MDUSWorkflowTester:
     """Test the complete MDUS workflow"""
     
@@ -36,13 +54,20 @@ class MDUSWorkflowTester:
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        # Deferred so importing this module (e.g. from a CI dispatcher) stays cheap
+        import httpx
+        
+        self.session = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=30, keepalive_expiry=75),
+            timeout=httpx.Timeout(60.0)
+        )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
         if self.session:
-            await self.session.close()
+            await self.session.aclose()
     
     async def test_health_checks(self) -> Dict[str, Any]:
         """Test system health endpoints"""
@@ -50,22 +75,22 @@ class MDUSWorkflowTester:
         print("🔍 Testing health checks...")
         
         # Test basic health
-        async with self.session.get(f"{self.base_url}/health") as response:
-            basic_health = await response.json()
-            assert response.status == 200
-            assert basic_health["status"] == "healthy"
+        response = await self.session.get(f"{self.base_url}/health")
+        basic_health = response.json()
+        assert response.status_code == 200
+        assert basic_health["status"] == "healthy"
         
         # Test detailed health
-        async with self.session.get(f"{self.base_url}/health/detailed") as response:
-            detailed_health = await response.json()
-            # Note: May show unhealthy status if database/Redis not running
-            print(f"   Detailed health: {detailed_health['status']}")
+        response = await self.session.get(f"{self.base_url}/health/detailed")
+        detailed_health = response.json()
+        # Note: May show unhealthy status if database/Redis not running
+        print(f"   Detailed health: {detailed_health['status']}")
         
         # Test monitoring health
         try:
-            async with self.session.get(f"{self.base_url}/monitoring/health") as response:
-                monitoring_health = await response.json()
-                print(f"   Monitoring health: {monitoring_health['status']}")
+            response = await self.session.get(f"{self.base_url}/monitoring/health")
+            monitoring_health = response.json()
+            print(f"   Monitoring health: {monitoring_health['status']}")
         except Exception as e:
             print(f"   Monitoring health: Error - {e}")
         
@@ -81,6 +106,8 @@ class MDUSWorkflowTester:
         
         print(f"📤 Testing file upload: {test_file['name']}")
         
+        import tempfile
+        
         # Create temporary test file
         with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp_file:
             temp_file.write(test_file['content'])
@@ -88,39 +115,38 @@ class MDUSWorkflowTester:
         
         try:
             # Prepare form data
-            data = aiohttp.FormData()
-            data.add_field('user_id', '1')
-            data.add_field('document_type', test_file['document_type'])
-            data.add_field('is_sensitive', 'true')
+            data = dict(FIXED_UPLOAD_FIELDS)
+            data['document_type'] = test_file['document_type']
             
             # Add file
             with open(temp_file_path, 'rb') as f:
-                data.add_field('file', f, filename=test_file['name'])
+                files = {'file': (test_file['name'], f, 'text/plain')}
                 
                 # Upload file
-                async with self.session.post(
+                response = await self.session.post(
                     f"{self.base_url}/documents/upload",
-                    data=data
-                ) as response:
-                    result = await response.json()
-                    
-                    if response.status == 200:
-                        print(f"   ✅ Upload successful: Document ID {result['document_id']}")
-                        return {
-                            "test": "file_upload",
-                            "status": "passed",
-                            "document_id": result['document_id'],
-                            "job_id": result['job_id'],
-                            "filename": result['filename']
-                        }
-                    else:
-                        print(f"   ❌ Upload failed: {result}")
-                        return {
-                            "test": "file_upload",
-                            "status": "failed", 
-                            "error": result,
-                            "filename": test_file['name']
-                        }
+                    data=data,
+                    files=files
+                )
+                result = response.json()
+                
+                if response.status_code == 200:
+                    print(f"   ✅ Upload successful: Document ID {result['document_id']}")
+                    return {
+                        "test": "file_upload",
+                        "status": "passed",
+                        "document_id": result['document_id'],
+                        "job_id": result['job_id'],
+                        "filename": result['filename']
+                    }
+                else:
+                    print(f"   ❌ Upload failed: {result}")
+                    return {
+                        "test": "file_upload",
+                        "status": "failed", 
+                        "error": result,
+                        "filename": test_file['name']
+                    }
         
         except Exception as e:
             print(f"   ❌ Upload error: {e}")
@@ -136,30 +162,62 @@ class MDUSWorkflowTester:
             Path(temp_file_path).unlink(missing_ok=True)
     
     async def test_job_status(self, job_id: str) -> Dict[str, Any]:
-        """Test job status monitoring"""
+        """Test job status monitoring (long-polls until the job finishes)"""
         
         print(f"⏱️  Testing job status: {job_id}")
         
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + JOB_STATUS_TIMEOUT
+        status = None
+        delay = JOB_POLL_MIN_DELAY
+        
         try:
-            async with self.session.get(f"{self.base_url}/processing/jobs/{job_id}") as response:
-                if response.status == 200:
-                    job_status = await response.json()
+            while True:
+                params = {"timeout": str(JOB_WAIT_POLL_TIMEOUT)}
+                if status:
+                    params["status"] = status
+                
+                response = await self.session.get(
+                    f"{self.base_url}/processing/jobs/{job_id}/wait",
+                    params=params
+                )
+                if response.status_code != 200:
+                    result = response.json()
+                    print(f"   ❌ Job status check failed: {result}")
+                    return {
+                        "test": "job_status",
+                        "status": "failed",
+                        "job_id": job_id,
+                        "error": result
+                    }
+                job_status = response.json()
+                
+                if job_status['status'] != status:
                     print(f"   Status: {job_status['status']}")
+                status = job_status['status']
+                
+                if status in TERMINAL_JOB_STATUSES:
                     return {
                         "test": "job_status",
                         "status": "passed",
                         "job_id": job_id,
-                        "job_status": job_status['status']
+                        "job_status": status
                     }
-                else:
-                    result = await response.json()
-                    print(f"   ❌ Job status check failed: {result}")
+                
+                if loop.time() >= deadline:
+                    print(f"   ❌ Job still '{status}' after {JOB_STATUS_TIMEOUT}s")
                     return {
                         "test": "job_status",
                         "status": "failed",
                         "job_id": job_id,
-                        "error": result
+                        "job_status": status,
+                        "error": f"Job did not finish within {JOB_STATUS_TIMEOUT}s"
                     }
+                
+                # Jittered exponential backoff so a server that answers
+                # immediately can't turn this into a busy loop
+                await asyncio.sleep(delay)
+                delay = min(JOB_POLL_MAX_DELAY, delay * 1.7 + random.uniform(0, 0.05))
         
         except Exception as e:
             print(f"   ❌ Job status error: {e}")
@@ -176,25 +234,25 @@ class MDUSWorkflowTester:
         print(f"📄 Testing document retrieval: {document_id}")
         
         try:
-            async with self.session.get(f"{self.base_url}/documents/{document_id}") as response:
-                if response.status == 200:
-                    document = await response.json()
-                    print(f"   ✅ Document retrieved: {document['filename']}")
-                    return {
-                        "test": "document_retrieval",
-                        "status": "passed",
-                        "document_id": document_id,
-                        "filename": document['filename']
-                    }
-                else:
-                    result = await response.json()
-                    print(f"   ❌ Document retrieval failed: {result}")
-                    return {
-                        "test": "document_retrieval", 
-                        "status": "failed",
-                        "document_id": document_id,
-                        "error": result
-                    }
+            response = await self.session.get(f"{self.base_url}/documents/{document_id}")
+            if response.status_code == 200:
+                document = response.json()
+                print(f"   ✅ Document retrieved: {document['filename']}")
+                return {
+                    "test": "document_retrieval",
+                    "status": "passed",
+                    "document_id": document_id,
+                    "filename": document['filename']
+                }
+            else:
+                result = response.json()
+                print(f"   ❌ Document retrieval failed: {result}")
+                return {
+                    "test": "document_retrieval", 
+                    "status": "failed",
+                    "document_id": document_id,
+                    "error": result
+                }
         
         except Exception as e:
             print(f"   ❌ Document retrieval error: {e}")
@@ -211,23 +269,23 @@ class MDUSWorkflowTester:
         print("📊 Testing queue statistics...")
         
         try:
-            async with self.session.get(f"{self.base_url}/processing/queue/stats") as response:
-                if response.status == 200:
-                    stats = await response.json()
-                    print(f"   Queue stats: {stats['queue_stats']}")
-                    return {
-                        "test": "queue_statistics",
-                        "status": "passed",
-                        "stats": stats
-                    }
-                else:
-                    result = await response.json()
-                    print(f"   ❌ Queue stats failed: {result}")
-                    return {
-                        "test": "queue_statistics",
-                        "status": "failed",
-                        "error": result
-                    }
+            response = await self.session.get(f"{self.base_url}/processing/queue/stats")
+            if response.status_code == 200:
+                stats = response.json()
+                print(f"   Queue stats: {stats['queue_stats']}")
+                return {
+                    "test": "queue_statistics",
+                    "status": "passed",
+                    "stats": stats
+                }
+            else:
+                result = response.json()
+                print(f"   ❌ Queue stats failed: {result}")
+                return {
+                    "test": "queue_statistics",
+                    "status": "failed",
+                    "error": result
+                }
         
         except Exception as e:
             print(f"   ❌ Queue stats error: {e}")
@@ -246,42 +304,42 @@ class MDUSWorkflowTester:
         
         # Test system metrics
         try:
-            async with self.session.get(f"{self.base_url}/monitoring/metrics") as response:
-                if response.status == 200:
-                    metrics = await response.json()
-                    results["metrics"] = "passed"
-                    print("   ✅ System metrics retrieved")
-                else:
-                    results["metrics"] = "failed"
-                    print("   ❌ System metrics failed")
+            response = await self.session.get(f"{self.base_url}/monitoring/metrics")
+            if response.status_code == 200:
+                metrics = response.json()
+                results["metrics"] = "passed"
+                print("   ✅ System metrics retrieved")
+            else:
+                results["metrics"] = "failed"
+                print("   ❌ System metrics failed")
         except Exception as e:
             results["metrics"] = f"error: {e}"
             print(f"   ❌ System metrics error: {e}")
         
         # Test alerts
         try:
-            async with self.session.get(f"{self.base_url}/monitoring/alerts") as response:
-                if response.status == 200:
-                    alerts = await response.json()
-                    results["alerts"] = "passed"
-                    print(f"   ✅ Alerts retrieved: {alerts['total_alerts']} alerts")
-                else:
-                    results["alerts"] = "failed"
-                    print("   ❌ Alerts retrieval failed")
+            response = await self.session.get(f"{self.base_url}/monitoring/alerts")
+            if response.status_code == 200:
+                alerts = response.json()
+                results["alerts"] = "passed"
+                print(f"   ✅ Alerts retrieved: {alerts['total_alerts']} alerts")
+            else:
+                results["alerts"] = "failed"
+                print("   ❌ Alerts retrieval failed")
         except Exception as e:
             results["alerts"] = f"error: {e}"
             print(f"   ❌ Alerts error: {e}")
         
         # Test storage stats
         try:
-            async with self.session.get(f"{self.base_url}/monitoring/storage") as response:
-                if response.status == 200:
-                    storage = await response.json()
-                    results["storage"] = "passed"
-                    print(f"   ✅ Storage stats retrieved")
-                else:
-                    results["storage"] = "failed"
-                    print("   ❌ Storage stats failed")
+            response = await self.session.get(f"{self.base_url}/monitoring/storage")
+            if response.status_code == 200:
+                storage = response.json()
+                results["storage"] = "passed"
+                print(f"   ✅ Storage stats retrieved")
+            else:
+                results["storage"] = "failed"
+                print("   ❌ Storage stats failed")
         except Exception as e:
             results["storage"] = f"error: {e}"
             print(f"   ❌ Storage stats error: {e}")
@@ -295,6 +353,8 @@ class MDUSWorkflowTester:
     async def run_complete_workflow_test(self) -> Dict[str, Any]:
         """Run complete workflow test"""
         
+        loop = asyncio.get_running_loop()
+        
         print("🚀 Starting MDUS Complete Workflow Test")
         print("=" * 50)
         
@@ -316,15 +376,12 @@ class MDUSWorkflowTester:
                 job_ids.append(upload_result["job_id"])
                 document_ids.append(upload_result["document_id"])
         
-        # Test 3: Job status monitoring
-        for job_id in job_ids:
-            job_result = await self.test_job_status(job_id)
-            self.test_results.append(job_result)
+        # Test 3 & 4: Job status monitoring and document retrieval are
+        # independent of each other, so run them concurrently
+        job_tasks = [loop.create_task(self.test_job_status(job_id)) for job_id in job_ids]
+        doc_tasks = [loop.create_task(self.test_document_retrieval(doc_id)) for doc_id in document_ids]
         
-        # Test 4: Document retrieval
-        for doc_id in document_ids:
-            doc_result = await self.test_document_retrieval(doc_id)
-            self.test_results.append(doc_result)
+        self.test_results.extend(await asyncio.gather(*job_tasks, *doc_tasks))
         
         # Test 5: Queue statistics
         queue_result = await self.test_queue_statistics()
@@ -335,10 +392,11 @@ class MDUSWorkflowTester:
         self.test_results.append(monitoring_result)
         
         # Generate summary
-        total_tests = len(self.test_results)
-        passed_tests = len([r for r in self.test_results if r["status"] == "passed"])
-        failed_tests = len([r for r in self.test_results if r["status"] == "failed"])
-        error_tests = len([r for r in self.test_results if r["status"] == "error"])
+        status_counts = Counter(r["status"] for r in self.test_results)
+        total_tests = sum(status_counts.values())
+        passed_tests = status_counts["passed"]
+        failed_tests = status_counts["failed"]
+        error_tests = status_counts["error"]
         
         print("\n" + "=" * 50)
         print("📋 Test Summary")
@@ -373,8 +431,12 @@ async def main():
             results = await tester.run_complete_workflow_test()
             
             # Save results to file
-            with open("test_results.json", "w") as f:
-                json.dump(results, f, indent=2)
+            if orjson is not None:
+                with open("test_results.json", "wb") as f:
+                    f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+            else:
+                with open("test_results.json", "w") as f:
+                    json.dump(results, f, indent=2)
             
             print(f"\n📁 Detailed results saved to: test_results.json")
             
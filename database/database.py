@@ -11,7 +11,7 @@ from typing import Generator, Optional
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
 
 from .models import Base
 
@@ -43,15 +43,23 @@ class DatabaseManager:
     
     def _setup_engine(self):
         """Setup SQLAlchemy engine with connection pooling"""
-        # Connection pool settings optimized for document processing workload
-        pool_settings = {
-            'poolclass': QueuePool,
-            'pool_size': int(os.getenv('DB_POOL_SIZE', '20')),  # Base pool size
-            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '30')),  # Additional connections
-            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),  # Timeout in seconds
-            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '3600')),  # Recycle connections after 1 hour
-            'pool_pre_ping': True,  # Validate connections before use
-        }
+        if os.getenv('USE_PGBOUNCER', '0') == '1':
+            # PgBouncer (transaction mode) owns the server-side pool, so every
+            # worker process opens short-lived client connections instead of
+            # holding its own QueuePool; no pre-ping round trip on checkout
+            pool_settings = {
+                'poolclass': NullPool,
+            }
+        else:
+            # Connection pool settings optimized for document processing workload
+            pool_settings = {
+                'poolclass': QueuePool,
+                'pool_size': int(os.getenv('DB_POOL_SIZE', '20')),  # Base pool size
+                'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '30')),  # Additional connections
+                'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),  # Timeout in seconds
+                'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '3600')),  # Recycle connections after 1 hour
+                'pool_pre_ping': False,  # TCP keepalives below keep idle connections valid
+            }
         
         # Create engine with optimization settings
         self.engine = create_engine(
@@ -61,6 +69,11 @@ class DatabaseManager:
                 "options": "-c timezone=utc",
                 "application_name": "mdus_system",
                 "connect_timeout": 10,
+                # Kernel-level keepalives so NAT/middleboxes don't drop idle pool connections
+                "keepalives": 1,
+                "keepalives_idle": 60,
+                "keepalives_interval": 10,
+                "keepalives_count": 5,
             },
             **pool_settings
         )
@@ -68,7 +81,10 @@ class DatabaseManager:
         # Add event listeners for monitoring and optimization
         self._setup_engine_events()
         
-        logger.info(f"Database engine created with pool_size={pool_settings['pool_size']}")
+        logger.info(
+            f"Database engine created with {pool_settings['poolclass'].__name__} "
+            f"(pool_size={pool_settings.get('pool_size', 'n/a')})"
+        )
     
     def _setup_engine_events(self):
         """Setup engine event listeners for monitoring and optimization"""
@@ -86,12 +102,14 @@ class DatabaseManager:
         @event.listens_for(self.engine, "checkout")
         def receive_checkout(dbapi_connection, connection_record, connection_proxy):
             """Log connection checkout"""
-            logger.debug(f"Connection checked out: {connection_record}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Connection checked out: %s", connection_record)
         
         @event.listens_for(self.engine, "checkin")
         def receive_checkin(dbapi_connection, connection_record):
             """Log connection checkin"""
-            logger.debug(f"Connection checked in: {connection_record}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Connection checked in: %s", connection_record)
     
     def _setup_session_factory(self):
         """Setup session factory"""
@@ -226,33 +244,31 @@ class DatabaseHealthCheck:
         
         try:
             with get_db_session() as session:
-                # Check basic connectivity
-                session.execute(text("SELECT 1"))
-                
-                # Check key tables exist
-                tables_check = session.execute(text("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = 'public' AND table_name IN 
-                    ('users', 'documents', 'document_analysis', 'processing_jobs')
-                """)).fetchall()
+                # Table presence, long-running transactions and server time in a
+                # single round trip; success of the query also proves connectivity
+                row = session.execute(text("""
+                    SELECT
+                        (SELECT count(*)
+                         FROM information_schema.tables
+                         WHERE table_schema = 'public' AND table_name = ANY(ARRAY[
+                            'users', 'documents', 'document_analysis', 'processing_jobs'
+                         ])) AS tables_found,
+                        (SELECT count(*)
+                         FROM pg_stat_activity
+                         WHERE state = 'active' AND now() - query_start > interval '5 minutes'
+                        ) AS long_tx,
+                        NOW() AS ts
+                """)).one()
                 
                 # Check pool status
                 pool_status = db_manager.get_pool_status()
                 
-                # Check for long-running transactions
-                long_transactions = session.execute(text("""
-                    SELECT count(*) 
-                    FROM pg_stat_activity 
-                    WHERE state = 'active' AND now() - query_start > interval '5 minutes'
-                """)).scalar()
-                
                 return {
                     "status": "healthy",
-                    "tables_found": len(tables_check),
+                    "tables_found": row.tables_found,
                     "pool_status": pool_status,
-                    "long_running_transactions": long_transactions,
-                    "timestamp": session.execute(text("SELECT NOW()")).scalar()
+                    "long_running_transactions": row.long_tx,
+                    "timestamp": row.ts
                 }
                 
         except Exception as e:
@@ -274,7 +290,7 @@ class DatabaseHealthCheck:
                 stats = {}
                 
                 # Table sizes
-                table_stats = session.execute(text("""
+                stats['table_statistics'] = session.execute(text("""
                     SELECT 
                         schemaname as schema,
                         tablename as table,
@@ -285,12 +301,10 @@ class DatabaseHealthCheck:
                         n_dead_tup as dead_tuples
                     FROM pg_stat_user_tables
                     ORDER BY n_live_tup DESC
-                """)).fetchall()
-                
-                stats['table_statistics'] = [dict(row) for row in table_stats]
+                """)).mappings().all()
                 
                 # Index usage
-                index_stats = session.execute(text("""
+                stats['index_usage'] = session.execute(text("""
                     SELECT 
                         schemaname as schema,
                         tablename as table,
@@ -301,9 +315,7 @@ class DatabaseHealthCheck:
                     WHERE idx_tup_read > 0
                     ORDER BY idx_tup_read DESC
                     LIMIT 20
-                """)).fetchall()
-                
-                stats['index_usage'] = [dict(row) for row in index_stats]
+                """)).mappings().all()
                 
                 return stats
                 
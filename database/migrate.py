@@ -6,13 +6,18 @@ Manages database schema versions and applies migrations in order.
 
 import os
 import sys
+import json
+import time
+import hashlib
 import logging
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 import argparse
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
 # Configure logging
 logging.basicConfig(
@@ -21,6 +26,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Advisory lock key serializing concurrent migration runs
+MIGRATION_LOCK_ID = 7_310_424_801
+
+# Attempts (with exponential backoff) when the database is unreachable
+CONNECT_RETRIES = 5
+
+# Batch size from which applied versions are recorded via COPY
+COPY_RECORD_THRESHOLD = 100
+
+# Seconds a cached `status` result stays valid
+STATUS_CACHE_TTL = 60
+
+# Top-level BEGIN;/COMMIT; lines that migration files wrap themselves in
+TRANSACTION_CONTROL_RE = re.compile(rb"^\s*(BEGIN|COMMIT)\s*;\s*$", re.IGNORECASE | re.MULTILINE)
+
+# Column-0 comment splitting a large migration into separately executed parts
+SPLIT_MARKER_RE = re.compile(rb"^-- @@SPLIT@@[^\n]*\n?", re.MULTILINE)
+
+# Statements Postgres refuses to run inside a transaction block
+NON_TRANSACTIONAL_RE = re.compile(
+    rb"^\s*(?:CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY|DROP\s+INDEX\s+CONCURRENTLY"
+    rb"|REINDEX\b.*\bCONCURRENTLY|VACUUM\b|ALTER\s+SYSTEM\b|(?:CREATE|DROP)\s+(?:DATABASE|TABLESPACE)\b)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Header tag marking migrations that may run concurrently with their neighbours
+PARALLEL_GROUP_RE = re.compile(rb"^--\s*mdus:parallel-group=(\S+)")
+PARALLEL_MIGRATION_WORKERS = 4
+
+def migration_sort_key(migration_name: str):
+    """Order migrations by their integer prefix (001_, 12_, ...), then by name"""
+    prefix, _, _ = migration_name.partition('_')
+    if prefix.isdigit():
+        return (int(prefix), migration_name)
+    return (float('inf'), migration_name)
+
 class DatabaseMigrator:
     """Database migration manager for MDUS system"""
     
@@ -28,61 +69,115 @@ class DatabaseMigrator:
         """Initialize migrator with database connection"""
         self.connection_string = connection_string
         self.migrations_dir = Path(__file__).parent / "migrations"
+        self._conn = None
         
+        # Sorted migration names, valid while the directory mtime is unchanged
+        self._available_cache = None
+        self._available_mtime = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
     def connect(self):
-        """Create database connection"""
+        """Get the database connection, opening it on first use"""
+        if self._conn is not None and not self._conn.closed:
+            return self._conn
+        
         try:
-            return psycopg2.connect(
+            # Autocommit so migration files control their own BEGIN/COMMIT;
+            # bookkeeping writes open explicit transactions. Statements run
+            # more than once on this connection are prepared server-side.
+            self._conn = psycopg.connect(
                 self.connection_string,
-                cursor_factory=RealDictCursor
+                autocommit=True,
+                prepare_threshold=1
             )
-        except psycopg2.Error as e:
+            return self._conn
+        except psycopg.Error as e:
             logger.error(f"Failed to connect to database: {e}")
-            sys.exit(1)
+            raise
+    
+    def close(self):
+        """Close the database connection if open"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
     
     def ensure_migrations_table(self):
         """Ensure schema_migrations table exists"""
-        with self.connect() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS schema_migrations (
-                        version VARCHAR(255) PRIMARY KEY,
-                        applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-                    );
-                """)
-                conn.commit()
-                logger.info("Ensured schema_migrations table exists")
+        with self.connect().cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(255) PRIMARY KEY,
+                    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+            """)
+            logger.info("Ensured schema_migrations table exists")
     
     def get_applied_migrations(self) -> List[str]:
         """Get list of applied migrations"""
-        with self.connect() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
-                return [row['version'] for row in cursor.fetchall()]
+        with self.connect().cursor() as cursor:
+            cursor.execute("SELECT version FROM schema_migrations", prepare=True)
+            # Same numeric order as the files; ORDER BY version would put 10_ before 2_
+            return sorted((version for (version,) in cursor), key=migration_sort_key)
     
     def get_available_migrations(self) -> List[str]:
         """Get list of available migration files"""
-        if not self.migrations_dir.exists():
+        try:
+            mtime = self.migrations_dir.stat().st_mtime_ns
+        except FileNotFoundError:
             logger.warning(f"Migrations directory {self.migrations_dir} not found")
             return []
         
-        migrations = []
-        for file_path in sorted(self.migrations_dir.glob("*.sql")):
-            migration_name = file_path.stem
-            migrations.append(migration_name)
+        if self._available_cache is not None and mtime == self._available_mtime:
+            return self._available_cache
+        
+        with os.scandir(self.migrations_dir) as entries:
+            migrations = [
+                entry.name[:-4] for entry in entries
+                if entry.name.endswith(".sql") and entry.is_file(follow_symlinks=False)
+            ]
+        migrations.sort(key=migration_sort_key)
         
+        self._available_cache = migrations
+        self._available_mtime = mtime
         return migrations
     
-    def get_pending_migrations(self) -> List[str]:
-        """Get list of pending migrations"""
-        applied = set(self.get_applied_migrations())
-        available = self.get_available_migrations()
+    def get_pending_migrations(self,
+                               applied: Optional[List[str]] = None,
+                               available: Optional[List[str]] = None) -> List[str]:
+        """Get list of pending migrations, reusing already-fetched lists if given"""
+        if available is None:
+            available = self.get_available_migrations()
+        
+        if applied is not None:
+            applied_set = set(applied)
+            # available is already in migration order, so the filtered list is too
+            pending = [m for m in available if m not in applied_set]
+            return pending
+        
+        if not available:
+            return []
         
-        pending = [m for m in available if m not in applied]
-        return sorted(pending)
+        # Let Postgres do the set difference so only pending names come back;
+        # ordinality keeps the file order independent of the DB collation
+        with self.connect().cursor() as cursor:
+            cursor.execute("""
+                SELECT f.version
+                FROM unnest(%s::text[]) WITH ORDINALITY AS f(version, position)
+                WHERE f.version NOT IN (SELECT version FROM schema_migrations)
+                ORDER BY f.position
+            """, (available,), prepare=True)
+            return [version for (version,) in cursor]
     
-    def apply_migration(self, migration_name: str) -> bool:
-        """Apply a single migration"""
+    def run_migration_sql(self,
+                          cursor,
+                          migration_name: str,
+                          strip_transaction_control: bool = False) -> bool:
+        """Execute a migration file's SQL on the given cursor"""
         migration_file = self.migrations_dir / f"{migration_name}.sql"
         
         if not migration_file.exists():
@@ -91,30 +186,232 @@ class DatabaseMigrator:
         
         logger.info(f"Applying migration: {migration_name}")
         
+        # Passed to the driver as bytes, skipping a decode/re-encode round trip
+        with migration_file.open('rb', buffering=1 << 20) as f:
+            migration_sql = f.read()
+        
+        if strip_transaction_control:
+            # The caller owns the transaction; a file-level COMMIT would end it early
+            migration_sql = TRANSACTION_CONTROL_RE.sub(b"", migration_sql)
+        
+        # Large files can be split at `-- @@SPLIT@@` lines to report progress;
+        # the chunks run back to back on the same connection/transaction
+        chunks = [chunk for chunk in SPLIT_MARKER_RE.split(migration_sql) if chunk.strip()]
+        for index, chunk in enumerate(chunks, 1):
+            # Multi-statement scripts must go through the simple query protocol
+            cursor.execute(chunk, prepare=False)
+            if len(chunks) > 1:
+                logger.info(f"  {migration_name}: part {index}/{len(chunks)} done")
+        
+        return True
+    
+    def apply_migration(self, migration_name: str, savepoint: bool = False) -> bool:
+        """Apply a single migration
+        
+        With savepoint=True the migration runs inside a SAVEPOINT of the
+        caller's open transaction and is recorded later by record_migrations.
+        Otherwise it is applied and recorded by _apply_and_record.
+        """
+        conn = self.connect()
+        try:
+            if not savepoint:
+                return self._apply_and_record(conn, migration_name)
+            
+            if self.is_non_transactional(migration_name):
+                logger.error(f"Migration {migration_name} cannot run inside a transaction, "
+                             f"apply it with --per-file-commit")
+                return False
+            
+            with conn.transaction(), conn.cursor() as cursor:
+                # The transaction is ours, so file-level BEGIN/COMMIT go
+                if not self.run_migration_sql(cursor, migration_name, strip_transaction_control=True):
+                    return False
+                
+                logger.info(f"Successfully applied migration: {migration_name}")
+                return True
+                
+        except psycopg.OperationalError:
+            # Connection-level trouble: let main()'s retry loop reconnect and
+            # resume; the transaction above has already rolled back
+            raise
+        except psycopg.Error as e:
+            logger.error(f"Failed to apply migration {migration_name}: {e}")
+            return False
+    
+    def _apply_and_record(self, conn, migration_name: str) -> bool:
+        """Apply one migration on an autocommit connection and record its version
+        
+        Normally the migration runs in a transaction of its own that also
+        records the version, so a committed migration is never left
+        unrecorded. Files with statements such as CREATE INDEX CONCURRENTLY
+        run in autocommit instead, one `-- @@SPLIT@@` part per statement, and
+        are recorded once every part has succeeded, in a bookkeeping
+        transaction with synchronous_commit off.
+        """
+        if self.is_non_transactional(migration_name):
+            # Each part commits on its own; any BEGIN/COMMIT in the file stay
+            with conn.cursor() as cursor:
+                if not self.run_migration_sql(cursor, migration_name):
+                    return False
+            
+            # The DDL is already committed and these files must be safe to
+            # re-run, so a record lost in a crash only costs a harmless re-apply;
+            # skip the WAL flush wait for it
+            with conn.transaction(), conn.cursor() as cursor:
+                cursor.execute("SET LOCAL synchronous_commit = off")
+                self._record_version(cursor, migration_name)
+        else:
+            with conn.transaction(), conn.cursor() as cursor:
+                if not self.run_migration_sql(cursor, migration_name, strip_transaction_control=True):
+                    return False
+                self._record_version(cursor, migration_name)
+        
+        logger.info(f"Successfully applied migration: {migration_name}")
+        return True
+    
+    def _record_version(self, cursor, migration_name: str):
+        """Insert one version into schema_migrations on the caller's transaction"""
+        # Migration files may already record themselves, hence ON CONFLICT
+        cursor.execute("""
+            INSERT INTO schema_migrations (version) VALUES (%s)
+            ON CONFLICT (version) DO NOTHING
+        """, (migration_name,), prepare=True)
+    
+    def is_non_transactional(self, migration_name: str) -> bool:
+        """Whether a migration file contains statements that can't run in a transaction"""
+        migration_file = self.migrations_dir / f"{migration_name}.sql"
+        if not migration_file.exists():
+            return False
+        
+        with migration_file.open('rb', buffering=1 << 20) as f:
+            return NON_TRANSACTIONAL_RE.search(f.read()) is not None
+    
+    def get_parallel_group(self, migration_name: str) -> Optional[str]:
+        """Read the `-- mdus:parallel-group=<tag>` header of a migration file"""
+        migration_file = self.migrations_dir / f"{migration_name}.sql"
+        if not migration_file.exists():
+            return None
+        
+        with migration_file.open('rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith(b"--"):
+                    break
+                match = PARALLEL_GROUP_RE.match(line)
+                if match:
+                    return match.group(1).decode()
+        
+        return None
+    
+    def _group_migrations(self, pending: List[str], parallel: bool) -> List[List[str]]:
+        """Split pending migrations into batches; consecutive files sharing a
+        parallel group form one batch, everything else runs on its own"""
+        if not parallel:
+            return [[m] for m in pending]
+        
+        batches = []
+        last_group = None
+        for migration in pending:
+            group = self.get_parallel_group(migration)
+            if group is not None and group == last_group:
+                batches[-1].append(migration)
+            else:
+                batches.append([migration])
+            last_group = group
+        
+        return batches
+    
+    def _apply_on_new_connection(self, migration_name: str) -> bool:
+        """Apply one migration on a dedicated connection (used by worker threads)"""
         try:
-            with self.connect() as conn:
-                with conn.cursor() as cursor:
-                    # Read and execute migration SQL
-                    migration_sql = migration_file.read_text()
-                    cursor.execute(migration_sql)
-                    
-                    # Record migration as applied (if not already recorded in migration file)
+            with psycopg.connect(self.connection_string, autocommit=True) as conn:
+                return self._apply_and_record(conn, migration_name)
+                
+        except psycopg.OperationalError:
+            # Re-raised out of executor.map in _apply_parallel, so main()'s
+            # retry loop reconnects instead of recording a failed migration
+            raise
+        except psycopg.Error as e:
+            logger.error(f"Failed to apply migration {migration_name}: {e}")
+            return False
+    
+    def _apply_parallel(self, batch: List[str]) -> List[bool]:
+        """Apply independent migrations concurrently, one connection each"""
+        logger.info(f"Applying {len(batch)} migrations in parallel: {batch}")
+        
+        with ThreadPoolExecutor(max_workers=PARALLEL_MIGRATION_WORKERS) as executor:
+            return list(executor.map(self._apply_on_new_connection, batch))
+    
+    def record_migrations(self, migration_names: List[str]) -> bool:
+        """Record the migrations of a single-transaction run with one batch"""
+        if not migration_names:
+            return True
+        
+        conn = self.connect()
+        try:
+            # Inside migrate()'s run-wide transaction this commits with the DDL,
+            # under the session's normal (durable) synchronous_commit
+            with conn.transaction(), conn.cursor() as cursor:
+                # Migration files may already record themselves, hence ON CONFLICT
+                if len(migration_names) < COPY_RECORD_THRESHOLD:
+                    # One statement with all versions as a single array parameter
                     cursor.execute("""
                         INSERT INTO schema_migrations (version) 
-                        VALUES (%s) 
+                        SELECT unnest(%s::text[]) 
                         ON CONFLICT (version) DO NOTHING
-                    """, (migration_name,))
-                    
-                    conn.commit()
-                    logger.info(f"Successfully applied migration: {migration_name}")
+                    """, (migration_names,))
                     return True
-                    
-        except psycopg2.Error as e:
-            logger.error(f"Failed to apply migration {migration_name}: {e}")
+                
+                # Large batches: bulk-load with COPY into a staging table,
+                # since COPY itself has no ON CONFLICT
+                cursor.execute("""
+                    CREATE TEMP TABLE applied_versions (version VARCHAR(255))
+                    ON COMMIT DROP
+                """)
+                with cursor.copy("COPY applied_versions (version) FROM STDIN") as copy:
+                    for migration_name in migration_names:
+                        copy.write_row((migration_name,))
+                
+                cursor.execute("""
+                    INSERT INTO schema_migrations (version) 
+                    SELECT version FROM applied_versions
+                    ON CONFLICT (version) DO NOTHING
+                """)
+                return True
+                
+        except psycopg.Error as e:
+            logger.error(f"Failed to record migrations {migration_names}: {e}")
             return False
     
-    def migrate(self, target_version: Optional[str] = None) -> bool:
-        """Apply all pending migrations up to target version"""
+    def migrate(self, target_version: Optional[str] = None, per_file_commit: bool = False) -> bool:
+        """Apply all pending migrations up to target version
+        
+        By default the whole run is one transaction (one WAL flush) with a
+        savepoint per migration; migrations applied before a failure are
+        committed together with their schema_migrations records.
+        per_file_commit=True lets every file commit on its own instead, each
+        in the same transaction as its schema_migrations record.
+        
+        Runs are serialized across processes with a Postgres advisory lock;
+        if another process holds it, this call returns without migrating.
+        """
+        conn = self.connect()
+        
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            locked = cursor.fetchone()[0]
+        
+        if not locked:
+            logger.info("Another process is applying migrations, skipping")
+            return True
+        
+        try:
+            return self._migrate_locked(target_version, per_file_commit)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    
+    def _migrate_locked(self, target_version: Optional[str], per_file_commit: bool) -> bool:
+        """Body of migrate(), run while holding the migration advisory lock"""
         self.ensure_migrations_table()
         
         pending = self.get_pending_migrations()
@@ -125,35 +422,84 @@ class DatabaseMigrator:
         
         # Filter to target version if specified
         if target_version:
-            try:
-                target_index = pending.index(target_version)
-                pending = pending[:target_index + 1]
-            except ValueError:
+            pending_index = {m: i for i, m in enumerate(pending)}
+            target_index = pending_index.get(target_version)
+            if target_index is None:
                 logger.error(f"Target migration '{target_version}' not found in pending migrations")
                 return False
+            pending = pending[:target_index + 1]
         
         logger.info(f"Found {len(pending)} pending migrations")
         
-        success_count = 0
-        for migration in pending:
-            if self.apply_migration(migration):
-                success_count += 1
+        conn = self.connect()
+        applied_now = []
+        recorded = False
+        
+        with (nullcontext() if per_file_commit else conn.transaction()):
+            # Parallel groups need independent commits, so they only apply
+            # outside the single-transaction mode
+            for batch in self._group_migrations(pending, parallel=per_file_commit):
+                if len(batch) == 1:
+                    results = [self.apply_migration(batch[0], savepoint=not per_file_commit)]
+                else:
+                    results = self._apply_parallel(batch)
+                
+                applied_now.extend(m for m, ok in zip(batch, results) if ok)
+                if not all(results):
+                    failed = [m for m, ok in zip(batch, results) if not ok]
+                    logger.error(f"Migration failed, stopping at: {failed[0]}")
+                    break
+            
+            if per_file_commit:
+                # Each migration already committed together with its record
+                recorded = True
             else:
-                logger.error(f"Migration failed, stopping at: {migration}")
-                break
+                recorded = self.record_migrations(applied_now)
+                if not recorded:
+                    # Don't commit schema changes without their bookkeeping
+                    raise psycopg.Rollback()
+        
+        if not recorded:
+            return False
         
-        logger.info(f"Applied {success_count}/{len(pending)} migrations")
-        return success_count == len(pending)
+        logger.info(f"Applied {len(applied_now)}/{len(pending)} migrations")
+        return len(applied_now) == len(pending)
     
     def status(self) -> Dict:
-        """Get migration status"""
+        """Get migration status
+        
+        Results are cached on disk for STATUS_CACHE_TTL seconds, keyed by the
+        migrations directory mtime and the count and hash of the applied
+        version set, so any insert or delete in schema_migrations (not just
+        a newer max version) invalidates the entry.
+        """
+        try:
+            dir_mtime = self.migrations_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = None
+        
+        try:
+            with self.connect().cursor() as cursor:
+                cursor.execute("""
+                    SELECT count(*), md5(coalesce(string_agg(version, ',' ORDER BY version), ''))
+                    FROM schema_migrations
+                """)
+                cache_key = [dir_mtime, *cursor.fetchone()]
+        except psycopg.errors.UndefinedTable:
+            cache_key = None
+        
+        if cache_key is not None:
+            cached = self._load_cached_status(cache_key)
+            if cached is not None:
+                return cached
+        
         self.ensure_migrations_table()
         
         applied = self.get_applied_migrations()
         available = self.get_available_migrations()
-        pending = self.get_pending_migrations()
+        pending = self.get_pending_migrations(applied, available)
         
-        return {
+        status = {
             "applied_count": len(applied),
             "available_count": len(available),
             "pending_count": len(pending),
@@ -161,6 +507,38 @@ class DatabaseMigrator:
             "pending_migrations": pending,
             "is_up_to_date": len(pending) == 0
         }
+        
+        if cache_key is not None:
+            self._save_cached_status(cache_key, status)
+        
+        return status
+    
+    def _status_cache_file(self) -> Path:
+        """Per-database location of the cached status"""
+        cache_root = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache')
+        db_key = hashlib.sha256(self.connection_string.encode()).hexdigest()[:16]
+        return cache_root / 'mdus' / f'status-{db_key}.json'
+    
+    def _load_cached_status(self, cache_key: list) -> Optional[Dict]:
+        """Return the cached status if it is fresh and its key still matches"""
+        try:
+            cached = json.loads(self._status_cache_file().read_text())
+        except (OSError, ValueError):
+            return None
+        
+        if cached.get('key') != cache_key or time.time() - cached.get('ts', 0) > STATUS_CACHE_TTL:
+            return None
+        
+        return cached['status']
+    
+    def _save_cached_status(self, cache_key: list, status: Dict):
+        """Persist status for subsequent invocations (best effort)"""
+        cache_file = self._status_cache_file()
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps({'key': cache_key, 'ts': time.time(), 'status': status}))
+        except OSError as e:
+            logger.debug(f"Could not write status cache {cache_file}: {e}")
     
     def rollback(self, target_version: str) -> bool:
         """Rollback to target version (simplified - requires manual rollback scripts)"""
@@ -168,13 +546,14 @@ class DatabaseMigrator:
         logger.warning("This is a simplified implementation - use with caution")
         
         applied = self.get_applied_migrations()
+        applied_index = {m: i for i, m in enumerate(applied)}
         
-        if target_version not in applied:
+        target_index = applied_index.get(target_version)
+        if target_index is None:
             logger.error(f"Target version '{target_version}' not found in applied migrations")
             return False
         
         # Find migrations to rollback (those after target_version)
-        target_index = applied.index(target_version)
         to_rollback = applied[target_index + 1:]
         
         if not to_rollback:
@@ -184,20 +563,20 @@ class DatabaseMigrator:
         logger.warning(f"Would need to rollback {len(to_rollback)} migrations: {to_rollback}")
         logger.warning("Manual rollback required - removing migration records only")
         
+        conn = self.connect()
         try:
-            with self.connect() as conn:
-                with conn.cursor() as cursor:
-                    for migration in reversed(to_rollback):
-                        cursor.execute(
-                            "DELETE FROM schema_migrations WHERE version = %s",
-                            (migration,)
-                        )
-                        logger.info(f"Removed migration record: {migration}")
-                    
-                    conn.commit()
-                    return True
-                    
-        except psycopg2.Error as e:
+            # Pipeline the per-version DELETEs so they share one round trip
+            with conn.transaction(), conn.pipeline(), conn.cursor() as cursor:
+                for migration in reversed(to_rollback):
+                    cursor.execute(
+                        "DELETE FROM schema_migrations WHERE version = %s",
+                        (migration,)
+                    )
+                    logger.info(f"Removed migration record: {migration}")
+                
+            return True
+                
+        except psycopg.Error as e:
             logger.error(f"Failed to rollback: {e}")
             return False
 
@@ -212,6 +591,33 @@ def get_connection_string():
         f"{os.getenv('POSTGRES_DB', 'mdus_db')}"
     )
 
+def run_command(migrator: DatabaseMigrator, args: argparse.Namespace):
+    """Execute a CLI command against an open migrator"""
+    if args.command == "status":
+        status = migrator.status()
+        print(f"Database Migration Status:")
+        print(f"  Applied migrations: {status['applied_count']}")
+        print(f"  Available migrations: {status['available_count']}")
+        print(f"  Pending migrations: {status['pending_count']}")
+        print(f"  Up to date: {status['is_up_to_date']}")
+        
+        if status['pending_migrations']:
+            print(f"\nPending migrations:")
+            for migration in status['pending_migrations']:
+                print(f"  - {migration}")
+    
+    elif args.command == "migrate":
+        success = migrator.migrate(args.target, per_file_commit=args.per_file_commit)
+        sys.exit(0 if success else 1)
+    
+    elif args.command == "rollback":
+        if not args.target:
+            logger.error("--target required for rollback command")
+            sys.exit(1)
+        
+        success = migrator.rollback(args.target)
+        sys.exit(0 if success else 1)
+
 def main():
     """Main CLI interface"""
     parser = argparse.ArgumentParser(description="MDUS Database Migration Tool")
@@ -224,6 +630,11 @@ def main():
         "--target",
         help="Target migration version"
     )
+    parser.add_argument(
+        "--per-file-commit",
+        action="store_true",
+        help="Commit each migration separately instead of one transaction for the run"
+    )
     parser.add_argument(
         "--connection-string",
         default=get_connection_string(),
@@ -240,32 +651,20 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    migrator = DatabaseMigrator(args.connection_string)
-    
-    if args.command == "status":
-        status = migrator.status()
-        print(f"Database Migration Status:")
-        print(f"  Applied migrations: {status['applied_count']}")
-        print(f"  Available migrations: {status['available_count']}")
-        print(f"  Pending migrations: {status['pending_count']}")
-        print(f"  Up to date: {status['is_up_to_date']}")
-        
-        if status['pending_migrations']:
-            print(f"\nPending migrations:")
-            for migration in status['pending_migrations']:
-                print(f"  - {migration}")
-    
-    elif args.command == "migrate":
-        success = migrator.migrate(args.target)
-        sys.exit(0 if success else 1)
-    
-    elif args.command == "rollback":
-        if not args.target:
-            logger.error("--target required for rollback command")
-            sys.exit(1)
-        
-        success = migrator.rollback(args.target)
-        sys.exit(0 if success else 1)
+    with DatabaseMigrator(args.connection_string) as migrator:
+        # Survive brief outages (e.g. a Postgres restart) instead of failing the run
+        for attempt in range(CONNECT_RETRIES):
+            try:
+                run_command(migrator, args)
+                break
+            except psycopg.OperationalError as e:
+                if attempt == CONNECT_RETRIES - 1:
+                    logger.error(f"Giving up after {CONNECT_RETRIES} attempts: {e}")
+                    sys.exit(1)
+                
+                delay = 2 ** attempt
+                logger.warning(f"Database unavailable, retrying in {delay}s")
+                time.sleep(delay)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
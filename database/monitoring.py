@@ -3,22 +3,41 @@ Database Monitoring and Performance Tracking for MDUS System
 Provides comprehensive monitoring, alerting, and performance analysis.
 """
 
+import asyncio
+import math
+import threading
 import time
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from contextlib import contextmanager
+from functools import lru_cache
 
 from sqlalchemy import text, func
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.orm import Session
 
 from .database import get_db_session
 
 logger = logging.getLogger(__name__)
 
+# Expected seconds between collect_performance_metrics() calls; sizes the
+# history buffer to hold 24 hours of samples
+SAMPLE_INTERVAL_SEC = 60
 
-@dataclass
+# Cycles between full collections; the ones in between refresh only the
+# connection, lock and running-query sections
+FULL_COLLECTION_EVERY = 10
+
+# Samples allowed past the 24 hour history before the oldest are trimmed
+TREND_PRUNE_BATCH = 64
+
+
+@dataclass(slots=True)
 class QueryPerformanceMetric:
     """Query performance metric"""
     query: str
@@ -29,7 +48,7 @@ class QueryPerformanceMetric:
     min_time: float
 
 
-@dataclass
+@dataclass(slots=True)
 class TableStatistic:
     """Table statistics"""
     table_name: str
@@ -43,11 +62,390 @@ class TableStatistic:
     idx_tup_fetch: int
 
 
+# Threads for the per-collector fallback batches; kept small so a failing
+# batch doesn't take a large share of the connection pool
+COLLECTOR_WORKERS = 4
+
+# Row cap for the per-table and per-index scans; only the largest and busiest
+# relations matter for monitoring
+STAT_ROW_LIMIT = 500
+
+# Collector name -> {result name: SELECT}. All of these are sent to the
+# server as one statement per collection cycle (see _run_batch)
+COLLECTOR_QUERIES: Dict[str, Dict[str, str]] = {
+    'connection_stats': {
+        # Per-state counts plus the overall total in one pass; the database
+        # OID is resolved once per monitor (see _load_server_info)
+        'connection_states': """
+            SELECT 
+                state,
+                COUNT(*) as count,
+                AVG(EXTRACT(EPOCH FROM (now() - state_change))) as avg_duration,
+                SUM(COUNT(*)) OVER () as total
+            FROM pg_stat_activity 
+            WHERE datid = :dboid
+            GROUP BY state
+        """,
+    },
+    'query_performance': {
+        # Top statement fingerprints by total time, calls and blocks read, all
+        # ranked in one scan; showtext => false skips reading the query-text
+        # file, which is only consulted for changed entries. Entries are unique
+        # per (userid, dbid, queryid, toplevel), so this database's top-level
+        # rows are folded per queryid to keep the queryid-keyed caches exact
+        'top_statements': """
+            WITH stmts AS (
+                SELECT 
+                    queryid,
+                    sum(calls)::bigint as calls,
+                    sum(total_exec_time) as total_exec_time,
+                    sum(shared_blks_read)::bigint as shared_blks_read
+                FROM pg_stat_statements(showtext => false)
+                WHERE dbid = :dboid AND toplevel
+                GROUP BY queryid
+            ),
+            ranked AS (
+                SELECT 
+                    queryid,
+                    calls,
+                    total_exec_time,
+                    row_number() OVER (ORDER BY total_exec_time DESC) as rn_time,
+                    row_number() OVER (ORDER BY calls DESC) as rn_calls,
+                    row_number() OVER (ORDER BY shared_blks_read DESC) as rn_io
+                FROM stmts
+            )
+            SELECT queryid, calls, total_exec_time, rn_time, rn_calls, rn_io
+            FROM ranked
+            WHERE rn_time <= 10 OR rn_calls <= 10 OR rn_io <= 10
+        """,
+        'pgss_reset': "SELECT stats_reset FROM pg_stat_statements_info",
+    },
+    'table_statistics': {
+        'table_statistics': """
+            SELECT 
+                schemaname,
+                relname as tablename,
+                n_live_tup as row_count,
+                -- relid is the table's OID, so no name is re-resolved per call
+                pg_total_relation_size(relid) as total_size,
+                pg_relation_size(relid) as table_size,
+                pg_indexes_size(relid) as index_size,
+                seq_scan,
+                seq_tup_read,
+                idx_scan,
+                idx_tup_fetch,
+                n_tup_ins as inserts,
+                n_tup_upd as updates,
+                n_tup_del as deletes
+            FROM pg_stat_user_tables 
+            ORDER BY total_size DESC
+            LIMIT :stat_row_limit
+        """,
+    },
+    'index_statistics': {
+        'index_usage': """
+            SELECT 
+                schemaname,
+                relname as tablename,
+                indexrelname as indexname,
+                idx_scan as scans,
+                idx_tup_read as tuples_read,
+                idx_tup_fetch as tuples_fetched,
+                pg_relation_size(indexrelid) as size_bytes
+            FROM pg_stat_user_indexes
+            ORDER BY idx_scan DESC
+            LIMIT :stat_row_limit
+        """,
+        'index_count': "SELECT COUNT(*) as count FROM pg_stat_user_indexes",
+        'unused_indexes': """
+            SELECT 
+                schemaname,
+                relname as tablename,
+                indexrelname as indexname,
+                pg_relation_size(indexrelid) as size_bytes
+            FROM pg_stat_user_indexes 
+            WHERE idx_scan = 0 
+            AND pg_relation_size(indexrelid) > 1024*1024  -- Larger than 1MB
+            ORDER BY size_bytes DESC
+            LIMIT :stat_row_limit
+        """,
+    },
+    'cache_statistics': {
+        # Heap and index block counters plus the buffer settings as one row
+        # set, dispatched by kind; current_setting() keeps SHOW's units
+        'cache_counters': """
+            SELECT 'heap' as kind, sum(heap_blks_read) as blks_read, sum(heap_blks_hit) as blks_hit,
+                   NULL as setting
+            FROM pg_statio_user_tables
+            UNION ALL
+            SELECT 'index', sum(idx_blks_read), sum(idx_blks_hit), NULL
+            FROM pg_statio_user_indexes
+            UNION ALL
+            SELECT name, NULL, NULL, current_setting(name)
+            FROM pg_settings
+            WHERE name IN ('shared_buffers', 'effective_cache_size')
+        """,
+    },
+    'lock_statistics': {
+        'lock_counts': """
+            SELECT 
+                mode,
+                COUNT(*) as count
+            FROM pg_locks 
+            GROUP BY mode
+            ORDER BY count DESC
+        """,
+        'waiting_locks': """
+            SELECT 
+                l.pid,
+                l.mode,
+                l.locktype,
+                l.relation::regclass as relation,
+                a.query,
+                EXTRACT(EPOCH FROM (now() - a.query_start)) as wait_time
+            FROM pg_locks l
+            JOIN pg_stat_activity a ON l.pid = a.pid
+            WHERE l.granted = false
+            AND EXTRACT(EPOCH FROM (now() - a.query_start)) > :lock_threshold
+            ORDER BY wait_time DESC
+        """,
+        'waiting_lock_count': "SELECT COUNT(*) as count FROM pg_locks WHERE NOT granted",
+        # pg_blocking_pids() reports the blockers directly instead of matching
+        # pg_locks against itself on every lock tag column
+        'blocking_queries': """
+            SELECT 
+                a.pid AS blocked_pid,
+                a.query as blocked_query,
+                b.pid AS blocking_pid,
+                b.query as blocking_query,
+                EXTRACT(EPOCH FROM (now() - a.query_start)) as blocked_duration
+            FROM pg_stat_activity a
+            CROSS JOIN LATERAL unnest(pg_blocking_pids(a.pid)) AS blocker(pid)
+            JOIN pg_stat_activity b ON b.pid = blocker.pid
+            WHERE a.wait_event_type = 'Lock'
+            ORDER BY blocked_duration DESC
+        """,
+    },
+    'disk_usage': {
+        'database_size': """
+            SELECT pg_size_pretty(pg_database_size(current_database())) as size,
+                   pg_database_size(current_database()) as size_bytes
+        """,
+        'tablespace_usage': """
+            SELECT 
+                spcname as tablespace,
+                pg_tablespace_location(oid) as location,
+                pg_size_pretty(pg_tablespace_size(spcname)) as size
+            FROM pg_tablespace
+        """,
+        # Top 10 largest tables
+        'largest_tables': """
+            SELECT 
+                table_name,
+                pg_size_pretty(size_bytes) as size,
+                size_bytes
+            FROM (
+                SELECT 
+                    schemaname||'.'||relname as table_name,
+                    pg_total_relation_size(relid) as size_bytes
+                FROM pg_stat_user_tables
+            ) t
+            ORDER BY size_bytes DESC
+            LIMIT 10
+        """,
+    },
+    'replication_stats': {
+        'is_primary': "SELECT NOT pg_is_in_recovery() AS is_primary",
+        # Replication slot information (primary)
+        'replication_slots': """
+            SELECT 
+                slot_name,
+                plugin,
+                slot_type,
+                datoid,
+                active,
+                restart_lsn,
+                confirmed_flush_lsn
+            FROM pg_replication_slots
+        """,
+        # WAL sender information (primary)
+        'wal_senders': """
+            SELECT 
+                pid,
+                state,
+                sent_lsn,
+                write_lsn,
+                flush_lsn,
+                replay_lsn,
+                EXTRACT(EPOCH FROM write_lag) as write_lag,
+                EXTRACT(EPOCH FROM flush_lag) as flush_lag,
+                EXTRACT(EPOCH FROM replay_lag) as replay_lag
+            FROM pg_stat_replication
+        """,
+        # Standby information
+        'recovery_info': """
+            SELECT 
+                pg_last_wal_receive_lsn() as received_lsn,
+                pg_last_wal_replay_lsn() as replayed_lsn,
+                pg_last_xact_replay_timestamp() as last_replay_timestamp
+        """,
+    },
+}
+
+
+# Full pg_stat_statements rows, fetched only for fingerprints whose calls
+# changed; folded per queryid across roles the same way as top_statements.
+# sum() of a bigint is numeric, so the counters are cast back to bigint to
+# match the json_agg() batch (ints either way, never Decimal)
+STATEMENT_DETAILS_SQL = text("""
+    SELECT 
+        queryid,
+        sum(calls)::bigint as calls,
+        sum(total_exec_time) as total_exec_time,
+        sum(total_exec_time) / nullif(sum(calls), 0) as mean_exec_time,
+        max(max_exec_time) as max_exec_time,
+        min(min_exec_time) as min_exec_time,
+        sum(rows)::bigint as rows,
+        sum(shared_blks_hit)::bigint as shared_blks_hit,
+        sum(shared_blks_read)::bigint as shared_blks_read,
+        (SELECT query_id FROM pg_stat_activity WHERE pid = pg_backend_pid()) as own_query_id
+    FROM pg_stat_statements(showtext => false)
+    WHERE queryid = ANY(CAST(:ids AS bigint[])) AND dbid = :dboid AND toplevel
+    GROUP BY queryid
+""")
+
+# Query text lookup; reads the whole query-text file, so results are kept in
+# an LRU cache and only unseen queryids are ever looked up
+QUERY_TEXT_SQL = text("""
+    SELECT DISTINCT ON (queryid)
+        queryid,
+        LEFT(query, 100) as query_sample,
+        (SELECT query_id FROM pg_stat_activity WHERE pid = pg_backend_pid()) as own_query_id
+    FROM pg_stat_statements 
+    WHERE queryid = ANY(CAST(:ids AS bigint[])) AND dbid = :dboid AND toplevel
+""")
+QUERY_TEXT_CACHE_SIZE = 1000
+
+# Cheap per-cycle check for new activity: total calls outside the monitor's
+# own statements, and the last pg_stat_statements_reset() time
+ACTIVITY_PROBE_SQL = """
+    SELECT 
+        coalesce(sum(calls) FILTER (WHERE NOT queryid = ANY(CAST(:own_ids AS bigint[]))), 0)::bigint as calls_sum,
+        (SELECT stats_reset FROM pg_stat_statements_info) as stats_reset
+    FROM pg_stat_statements(showtext => false)
+"""
+
+# Currently running queries; only those past the alert threshold come back as
+# rows, the rest are just counted. Polled every cycle with the volatile
+# sections, since a stuck query never shows up in pg_stat_statements
+ACTIVE_QUERIES = {
+    'long_running_queries': """
+        SELECT 
+            pid,
+            state,
+            LEFT(query, 100) as query_sample,
+            EXTRACT(EPOCH FROM (now() - query_start)) as duration
+        FROM pg_stat_activity 
+        WHERE state = 'active' 
+        AND query NOT LIKE '%pg_stat_activity%'
+        AND EXTRACT(EPOCH FROM (now() - query_start)) > :long_q_threshold
+        ORDER BY duration DESC
+    """,
+    'active_slow_query_count': """
+        SELECT COUNT(*) as count
+        FROM pg_stat_activity 
+        WHERE state = 'active' 
+        AND query NOT LIKE '%pg_stat_activity%'
+        AND EXTRACT(EPOCH FROM (now() - query_start)) > 30
+    """,
+}
+
+# Sampled wait-event profile from pg_wait_sampling, when installed; not
+# grouped by pid, which would multiply the rows per backend
+WAIT_EVENT_PROFILE_SQL = """
+    SELECT event_type, event, sum(count) as count
+    FROM pg_wait_sampling_profile
+    WHERE event_type IN ('Lock', 'LWLock', 'BufferPin')
+    GROUP BY event_type, event
+    ORDER BY count DESC
+    LIMIT 50
+"""
+
+# Result columns json_agg() can't carry natively: timestamps arrive as ISO
+# strings and the replication lags as epoch seconds (see replication_stats)
+JSON_COLUMN_TYPES: Dict[str, Callable[[Any], Any]] = {
+    'stats_reset': datetime.fromisoformat,
+    'last_replay_timestamp': datetime.fromisoformat,
+    'write_lag': lambda seconds: timedelta(seconds=seconds),
+    'flush_lag': lambda seconds: timedelta(seconds=seconds),
+    'replay_lag': lambda seconds: timedelta(seconds=seconds),
+}
+
+# Sections that change from second to second and are re-polled even when the
+# activity probe shows nothing new has executed
+VOLATILE_COLLECTORS = ('connection_stats', 'lock_statistics')
+
+
+@lru_cache(maxsize=32)
+def _batch_statement(queries: Tuple[Tuple[str, str], ...]) -> TextClause:
+    """Build the combined statement for a set of named queries once and reuse it"""
+    # psycopg2 only hands back the last result of a multi-statement script, so
+    # each query becomes a json_agg() column of a single SELECT instead
+    columns = ",\n".join(
+        f"(SELECT coalesce(json_agg(q), '[]'::json) FROM ({sql}) q) AS \"{name}\""
+        for name, sql in queries
+    )
+    # The batch also reports its own pg_stat_statements queryid
+    return text(f"""
+        SELECT {columns},
+            (SELECT query_id FROM pg_stat_activity WHERE pid = pg_backend_pid()) AS own_query_id
+    """)
+
+
+def _run_batch(session: Session, queries: Dict[str, str], params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run several SELECTs in one round trip, returning each result as a list of row dicts"""
+    row = session.execute(_batch_statement(tuple(queries.items())), params or {}).one()
+    results = dict(row._mapping)
+    for name in queries:
+        _restore_json_types(results[name])
+    return results
+
+
+def _restore_json_types(rows: List[Dict[str, Any]]):
+    """Convert the columns json_agg() flattens back to the types a plain query returns"""
+    if not rows:
+        return
+    columns = [(column, JSON_COLUMN_TYPES[column]) for column in rows[0] if column in JSON_COLUMN_TYPES]
+    for row in rows:
+        for column, convert in columns:
+            if row[column] is not None:
+                row[column] = convert(row[column])
+
+
+def _pg_array(values) -> str:
+    """Format ints as one bigint[] literal so the statement's queryid doesn't vary with the count"""
+    return '{' + ','.join(str(value) for value in values) + '}'
+
+
+def _hit_ratio(counters: Dict[str, Any]) -> float:
+    """Percentage of block reads served from shared buffers"""
+    blks_read, blks_hit = counters['blks_read'] or 0, counters['blks_hit'] or 0
+    total = blks_read + blks_hit
+    return blks_hit * 100.0 / total if total > 0 else 0.0
+
+
 class DatabaseMonitor:
     """Comprehensive database monitoring system"""
     
     def __init__(self):
-        self.performance_history = []
+        # Trend scalars are kept column-wise in parallel lists; the full
+        # metrics dicts are returned to callers but not retained. Lists (not
+        # deques) so the window lookup can bisect with O(1) indexing
+        self._history_size = int(24 * 3600 / SAMPLE_INTERVAL_SEC)
+        self._trend: Dict[str, list] = {
+            column: []
+            for column in ('ts', 'ts_iso', 'conn_util', 'cache_hit', 'active_q', 'db_size')
+        }
         self.alert_thresholds = {
             'connection_pool_usage': 0.8,  # 80% pool utilization
             'long_running_query_seconds': 300,  # 5 minutes
@@ -56,412 +454,461 @@ class DatabaseMonitor:
             'cache_hit_ratio': 0.95,  # 95% cache hit ratio
             'index_hit_ratio': 0.95,  # 95% index hit ratio
         }
+        # pg_stat_statements calls per queryid as of the last cycle, and the
+        # detail rows already fetched for them
+        self._pgss_calls_cache: Dict[int, int] = {}
+        self._pgss_details: Dict[int, Dict[str, Any]] = {}
+        self._pgss_last_reset = None
+        self._query_texts: OrderedDict = OrderedDict()
+        # Activity probe result and full metrics from the last heavy collection,
+        # plus the queryids of the monitor's own statements
+        self._last_probe: Optional[Tuple[int, Any]] = None
+        self._last_snapshot: Optional[Dict[str, Any]] = None
+        self._cycles_since_full = 0
+        self.full_collection_every = FULL_COLLECTION_EVERY
+        self._own_queryids: set = set()
+        # Collector groups whose queries failed; run outside the combined batch
+        self._failed_collectors: set = set()
+        # Fixed for the life of the server, so looked up on the first collection
+        self.has_wait_sampling: Optional[bool] = None
+        self.has_pg_stat_statements: Optional[bool] = None
+        self._dboid: Optional[int] = None
+        self._max_connections: Optional[int] = None
     
-    def collect_performance_metrics(self) -> Dict[str, Any]:
-        """Collect comprehensive database performance metrics"""
+    def collect_performance_metrics(self, fast: Optional[bool] = None) -> Dict[str, Any]:
+        """Collect comprehensive database performance metrics
+        
+        fast=True refreshes only the volatile sections, fast=False forces the
+        full battery, and None runs the full battery every
+        full_collection_every cycles if the activity probe saw new work.
+        """
+        timestamp = datetime.now(timezone.utc)
         try:
             with get_db_session() as session:
-                metrics = {
-                    'timestamp': datetime.utcnow(),
-                    'connection_stats': self._get_connection_stats(session),
-                    'query_performance': self._get_query_performance(session),
-                    'table_statistics': self._get_table_statistics(session),
-                    'index_statistics': self._get_index_statistics(session),
-                    'cache_statistics': self._get_cache_statistics(session),
-                    'lock_statistics': self._get_lock_statistics(session),
-                    'disk_usage': self._get_disk_usage(session),
-                    'replication_stats': self._get_replication_stats(session),
-                }
+                # Autocommit, so no BEGIN/COMMIT of the monitor's own lands in
+                # pg_stat_statements and a failed query doesn't abort the rest
+                session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+                if self._dboid is None:
+                    self._load_server_info(session)
                 
-                # Store in history for trend analysis
-                self.performance_history.append(metrics)
+                groups = {'active_queries': ACTIVE_QUERIES}
+                if self.has_pg_stat_statements:
+                    groups['activity_probe'] = {'activity_probe': ACTIVITY_PROBE_SQL}
+                groups.update((name, self._collector_queries(name)) for name in VOLATILE_COLLECTORS)
+                results, errors = self._run_collector_queries(session, groups)
+                probe = self._parse_activity_probe(results) if 'activity_probe' in results else None
+                
+                if not self._last_snapshot:
+                    full = True
+                elif fast is None:
+                    activity = probe is None or probe != self._last_probe
+                    full = activity and self._cycles_since_full + 1 >= self.full_collection_every
+                else:
+                    full = not fast
                 
-                # Keep only last 24 hours of data
-                cutoff_time = datetime.utcnow() - timedelta(hours=24)
-                self.performance_history = [
-                    m for m in self.performance_history 
-                    if m['timestamp'] > cutoff_time
-                ]
+                if not full:
+                    # Heavy sections are carried over from the last full
+                    # collection; only the volatile sections are refreshed
+                    self._cycles_since_full += 1
+                    metrics = {**self._last_snapshot, 'timestamp': timestamp}
+                    metrics.update(self._parse_collectors(results, errors, VOLATILE_COLLECTORS))
+                    if 'active_queries' not in errors:
+                        metrics['query_performance'] = {
+                            **metrics['query_performance'], **self._parse_active_queries(results)
+                        }
+                else:
+                    heavy = {name: self._collector_queries(name) for name in COLLECTOR_QUERIES
+                             if name not in VOLATILE_COLLECTORS}
+                    heavy_results, heavy_errors = self._run_collector_queries(session, heavy)
+                    results.update(heavy_results)
+                    errors.update(heavy_errors)
+                    if self.has_pg_stat_statements and 'query_performance' not in errors:
+                        try:
+                            self._refresh_statement_details(session, results)
+                        except Exception as e:
+                            errors['query_performance'] = e
+                    
+                    metrics = {'timestamp': timestamp}
+                    metrics.update(self._parse_collectors(results, errors, COLLECTOR_QUERIES))
+                    self._last_snapshot = metrics
+                    self._last_probe = probe
+                    self._cycles_since_full = 0
+                
+                # Store in history for trend analysis
+                self._record_trend(metrics)
                 
                 return metrics
                 
         except Exception as e:
             logger.error(f"Failed to collect performance metrics: {e}")
-            return {'error': str(e), 'timestamp': datetime.utcnow()}
+            return {'error': str(e), 'timestamp': timestamp}
     
-    def _get_connection_stats(self, session: Session) -> Dict[str, Any]:
-        """Get database connection statistics"""
-        try:
-            stats = session.execute(text("""
-                SELECT 
-                    state,
-                    COUNT(*) as count,
-                    AVG(EXTRACT(EPOCH FROM (now() - state_change))) as avg_duration
-                FROM pg_stat_activity 
-                WHERE datname = current_database()
-                GROUP BY state
-            """)).fetchall()
-            
-            connection_stats = {row.state: {'count': row.count, 'avg_duration': row.avg_duration} 
-                              for row in stats}
-            
-            # Get total connections
-            total_connections = session.execute(text("""
-                SELECT COUNT(*) FROM pg_stat_activity WHERE datname = current_database()
-            """)).scalar()
-            
-            # Get max connections
-            max_connections = session.execute(text("SHOW max_connections")).scalar()
-            
-            connection_stats['total_connections'] = total_connections
-            connection_stats['max_connections'] = int(max_connections)
-            connection_stats['utilization'] = total_connections / int(max_connections)
-            
-            return connection_stats
-            
-        except Exception as e:
-            logger.error(f"Failed to get connection stats: {e}")
-            return {'error': str(e)}
+    def _record_trend(self, metrics: Dict[str, Any]):
+        """Append the scalars tracked by get_performance_trends to the history lists"""
+        trend = self._trend
+        trend['ts'].append(metrics['timestamp'])
+        # Formatted once here rather than on every get_performance_trends() call
+        trend['ts_iso'].append(metrics['timestamp'].isoformat())
+        trend['conn_util'].append(metrics['connection_stats'].get('utilization', 0))
+        trend['cache_hit'].append(metrics['cache_statistics'].get('cache_hit_ratio', 0))
+        trend['active_q'].append(metrics['query_performance'].get('active_slow_query_count', 0))
+        trend['db_size'].append(metrics['disk_usage'].get('database_size_bytes', 0))
+        
+        # Trim the oldest samples in blocks, so the front deletion is amortised
+        # O(1) per sample instead of a shift on every append
+        excess = len(trend['ts']) - self._history_size
+        if excess >= TREND_PRUNE_BATCH:
+            for column in trend.values():
+                del column[:excess]
     
-    def _get_query_performance(self, session: Session) -> Dict[str, Any]:
-        """Get query performance statistics"""
-        try:
-            # Get top slow queries from pg_stat_statements
-            slow_queries = session.execute(text("""
-                SELECT 
-                    LEFT(query, 100) as query_sample,
-                    calls,
-                    total_exec_time,
-                    mean_exec_time,
-                    max_exec_time,
-                    min_exec_time,
-                    rows,
-                    shared_blks_hit,
-                    shared_blks_read
-                FROM pg_stat_statements 
-                WHERE total_exec_time > 1000  -- Queries taking more than 1 second total
-                ORDER BY total_exec_time DESC 
-                LIMIT 10
-            """)).fetchall()
-            
-            query_metrics = []
-            for row in slow_queries:
-                query_metrics.append(QueryPerformanceMetric(
-                    query=row.query_sample,
-                    total_time=row.total_exec_time,
-                    calls=row.calls,
-                    mean_time=row.mean_exec_time,
-                    max_time=row.max_exec_time,
-                    min_time=row.min_exec_time
-                ).__dict__)
-            
-            # Get currently running slow queries
-            active_queries = session.execute(text("""
-                SELECT 
-                    pid,
-                    state,
-                    LEFT(query, 100) as query_sample,
-                    EXTRACT(EPOCH FROM (now() - query_start)) as duration
-                FROM pg_stat_activity 
-                WHERE state = 'active' 
-                AND query NOT LIKE '%pg_stat_activity%'
-                AND EXTRACT(EPOCH FROM (now() - query_start)) > 30
-                ORDER BY duration DESC
-            """)).fetchall()
-            
-            return {
-                'slow_queries': query_metrics,
-                'active_slow_queries': [dict(row) for row in active_queries],
-                'total_queries_analyzed': len(slow_queries)
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to get query performance: {e}")
-            return {'error': str(e)}
+    async def collect_performance_metrics_async(self, fast: Optional[bool] = None) -> Dict[str, Any]:
+        """Collect performance metrics without blocking the event loop"""
+        # Collection is already a single batched round trip, so there is
+        # nothing left to gather; run it on a worker thread instead
+        return await asyncio.to_thread(self.collect_performance_metrics, fast)
     
-    def _get_table_statistics(self, session: Session) -> List[Dict[str, Any]]:
-        """Get table usage statistics"""
-        try:
-            stats = session.execute(text("""
-                SELECT 
-                    schemaname,
-                    tablename,
-                    n_live_tup as row_count,
-                    pg_total_relation_size(schemaname||'.'||tablename) as total_size,
-                    pg_relation_size(schemaname||'.'||tablename) as table_size,
-                    pg_indexes_size(schemaname||'.'||tablename) as index_size,
-                    seq_scan,
-                    seq_tup_read,
-                    idx_scan,
-                    idx_tup_fetch,
-                    n_tup_ins as inserts,
-                    n_tup_upd as updates,
-                    n_tup_del as deletes
-                FROM pg_stat_user_tables 
-                JOIN pg_class ON pg_class.relname = tablename
-                ORDER BY total_size DESC
-            """)).fetchall()
-            
-            table_stats = []
-            for row in stats:
-                table_stats.append(TableStatistic(
-                    table_name=f"{row.schemaname}.{row.tablename}",
-                    row_count=row.row_count or 0,
-                    table_size=row.table_size or 0,
-                    index_size=row.index_size or 0,
-                    total_size=row.total_size or 0,
-                    seq_scan=row.seq_scan or 0,
-                    seq_tup_read=row.seq_tup_read or 0,
-                    idx_scan=row.idx_scan or 0,
-                    idx_tup_fetch=row.idx_tup_fetch or 0
-                ).__dict__)
-            
-            return table_stats
-            
-        except Exception as e:
-            logger.error(f"Failed to get table statistics: {e}")
-            return [{'error': str(e)}]
+    def _collector_parsers(self) -> Dict[str, Callable[[Dict[str, list]], Any]]:
+        """Map each metrics section to the parser for its query results"""
+        return {
+            'connection_stats': self._parse_connection_stats,
+            'query_performance': self._parse_query_performance,
+            'table_statistics': self._parse_table_statistics,
+            'index_statistics': self._parse_index_statistics,
+            'cache_statistics': self._parse_cache_statistics,
+            'lock_statistics': self._parse_lock_statistics,
+            'disk_usage': self._parse_disk_usage,
+            'replication_stats': self._parse_replication_stats,
+        }
     
-    def _get_index_statistics(self, session: Session) -> Dict[str, Any]:
-        """Get index usage statistics"""
-        try:
-            index_stats = session.execute(text("""
-                SELECT 
-                    schemaname,
-                    tablename,
-                    indexname,
-                    idx_scan as scans,
-                    idx_tup_read as tuples_read,
-                    idx_tup_fetch as tuples_fetched,
-                    pg_relation_size(indexrelid) as size_bytes
-                FROM pg_stat_user_indexes
-                ORDER BY idx_scan DESC
-            """)).fetchall()
-            
-            unused_indexes = session.execute(text("""
-                SELECT 
-                    schemaname,
-                    tablename,
-                    indexname,
-                    pg_relation_size(indexrelid) as size_bytes
-                FROM pg_stat_user_indexes 
-                WHERE idx_scan = 0 
-                AND pg_relation_size(indexrelid) > 1024*1024  -- Larger than 1MB
-                ORDER BY size_bytes DESC
-            """)).fetchall()
-            
-            return {
-                'index_usage': [dict(row) for row in index_stats],
-                'unused_indexes': [dict(row) for row in unused_indexes],
-                'total_indexes': len(index_stats)
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to get index statistics: {e}")
-            return {'error': str(e)}
+    def _parse_collectors(self, results: Dict[str, list], errors: Dict[str, Exception],
+                          collectors) -> Dict[str, Any]:
+        """Parse the given collector sections, substituting error placeholders"""
+        parsers = self._collector_parsers()
+        sections = {}
+        for collector in collectors:
+            if collector in errors:
+                sections[collector] = self._collector_error(collector, errors[collector])
+                continue
+            try:
+                sections[collector] = parsers[collector](results)
+            except Exception as e:
+                sections[collector] = self._collector_error(collector, e)
+        return sections
     
-    def _get_cache_statistics(self, session: Session) -> Dict[str, Any]:
-        """Get database cache statistics"""
+    def _load_server_info(self, session: Session):
+        """Look up the database OID, max_connections and optional extension presence"""
         try:
-            # Buffer cache hit ratio
-            cache_stats = session.execute(text("""
-                SELECT 
-                    sum(heap_blks_read) as heap_read,
-                    sum(heap_blks_hit) as heap_hit,
-                    sum(heap_blks_read + heap_blks_hit) as heap_total,
-                    CASE WHEN sum(heap_blks_read + heap_blks_hit) > 0 
-                         THEN sum(heap_blks_hit) * 100.0 / sum(heap_blks_read + heap_blks_hit)
-                         ELSE 0 
-                    END as cache_hit_ratio
-                FROM pg_statio_user_tables
-            """)).fetchone()
-            
-            # Index cache hit ratio
-            index_cache_stats = session.execute(text("""
-                SELECT 
-                    sum(idx_blks_read) as idx_read,
-                    sum(idx_blks_hit) as idx_hit,
-                    CASE WHEN sum(idx_blks_read + idx_blks_hit) > 0 
-                         THEN sum(idx_blks_hit) * 100.0 / sum(idx_blks_read + idx_blks_hit)
-                         ELSE 0 
-                    END as index_hit_ratio
-                FROM pg_statio_user_indexes
-            """)).fetchone()
-            
-            # Shared buffer settings
-            shared_buffers = session.execute(text("SHOW shared_buffers")).scalar()
-            effective_cache_size = session.execute(text("SHOW effective_cache_size")).scalar()
-            
-            return {
-                'heap_blocks_read': cache_stats.heap_read or 0,
-                'heap_blocks_hit': cache_stats.heap_hit or 0,
-                'cache_hit_ratio': float(cache_stats.cache_hit_ratio or 0),
-                'index_hit_ratio': float(index_cache_stats.index_hit_ratio or 0),
-                'shared_buffers': shared_buffers,
-                'effective_cache_size': effective_cache_size
-            }
-            
+            results = self._execute_batch(session, {
+                'server_info': """
+                    SELECT 
+                        (SELECT oid FROM pg_database WHERE datname = current_database()) as dboid,
+                        current_setting('max_connections')::int as max_connections,
+                        EXISTS (
+                            SELECT 1 FROM pg_extension WHERE extname = 'pg_wait_sampling'
+                        ) as has_wait_sampling,
+                        -- The views only work when the library is also preloaded
+                        EXISTS (
+                            SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'
+                        ) AND 'pg_stat_statements' = ANY(string_to_array(
+                            replace(current_setting('shared_preload_libraries'), ' ', ''), ','
+                        )) as has_pg_stat_statements
+                """
+            })
         except Exception as e:
-            logger.error(f"Failed to get cache statistics: {e}")
-            return {'error': str(e)}
+            logger.warning(f"Could not load database server info: {e}")
+            return
+        
+        info = results['server_info'][0]
+        self._dboid = info['dboid']
+        self._max_connections = info['max_connections']
+        self.has_wait_sampling = info['has_wait_sampling']
+        self.has_pg_stat_statements = info['has_pg_stat_statements']
+        if not self.has_pg_stat_statements:
+            logger.info("pg_stat_statements not available; statement statistics are skipped")
     
-    def _get_lock_statistics(self, session: Session) -> Dict[str, Any]:
-        """Get database lock statistics"""
-        try:
-            locks = session.execute(text("""
-                SELECT 
-                    mode,
-                    COUNT(*) as count
-                FROM pg_locks 
-                GROUP BY mode
-                ORDER BY count DESC
-            """)).fetchall()
-            
-            waiting_locks = session.execute(text("""
-                SELECT 
-                    l.pid,
-                    l.mode,
-                    l.locktype,
-                    l.relation::regclass as relation,
-                    a.query,
-                    EXTRACT(EPOCH FROM (now() - a.query_start)) as wait_time
-                FROM pg_locks l
-                JOIN pg_stat_activity a ON l.pid = a.pid
-                WHERE l.granted = false
-                ORDER BY wait_time DESC
-            """)).fetchall()
-            
-            blocking_queries = session.execute(text("""
-                SELECT 
-                    blocked_locks.pid AS blocked_pid,
-                    blocked_activity.query as blocked_query,
-                    blocking_locks.pid AS blocking_pid,
-                    blocking_activity.query as blocking_query,
-                    EXTRACT(EPOCH FROM (now() - blocked_activity.query_start)) as blocked_duration
-                FROM pg_catalog.pg_locks blocked_locks
-                JOIN pg_catalog.pg_stat_activity blocked_activity ON blocked_activity.pid = blocked_locks.pid
-                JOIN pg_catalog.pg_locks blocking_locks ON blocking_locks.locktype = blocked_locks.locktype
-                    AND blocking_locks.relation = blocked_locks.relation
-                    AND blocking_locks.page = blocked_locks.page
-                    AND blocking_locks.tuple = blocked_locks.tuple
-                    AND blocking_locks.virtualxid = blocked_locks.virtualxid
-                    AND blocking_locks.transactionid = blocked_locks.transactionid
-                    AND blocking_locks.classid = blocked_locks.classid
-                    AND blocking_locks.objid = blocked_locks.objid
-                    AND blocking_locks.objsubid = blocked_locks.objsubid
-                    AND blocking_locks.pid != blocked_locks.pid
-                JOIN pg_catalog.pg_stat_activity blocking_activity ON blocking_activity.pid = blocking_locks.pid
-                WHERE NOT blocked_locks.granted
-                ORDER BY blocked_duration DESC
-            """)).fetchall()
-            
-            return {
-                'lock_counts': [dict(row) for row in locks],
-                'waiting_locks': [dict(row) for row in waiting_locks],
-                'blocking_queries': [dict(row) for row in blocking_queries]
+    def _collector_queries(self, collector: str) -> Dict[str, str]:
+        """Get a collector's queries, including optional extension-backed ones"""
+        if collector == 'query_performance' and not self.has_pg_stat_statements:
+            # Keeps the pg_stat_statements views out of the batch entirely
+            return {}
+        queries = COLLECTOR_QUERIES[collector]
+        if collector == 'lock_statistics' and self.has_wait_sampling:
+            queries = {**queries, 'wait_event_profile': WAIT_EVENT_PROFILE_SQL}
+        return queries
+    
+    def _parse_activity_probe(self, results: Dict[str, list]) -> Tuple[int, Any]:
+        """Reduce the activity probe to a comparable (calls, reset time) pair"""
+        probe = results['activity_probe'][0]
+        return probe['calls_sum'], probe['stats_reset']
+    
+    def _execute_batch(self, session: Session, queries: Dict[str, str]) -> Dict[str, list]:
+        """Run a timed query batch and remember its queryid as one of the monitor's own"""
+        params = {
+            'own_ids': _pg_array(self._own_queryids),
+            'long_q_threshold': self.alert_thresholds['long_running_query_seconds'],
+            'lock_threshold': self.alert_thresholds['lock_wait_seconds'],
+            'dboid': self._dboid,
+            'stat_row_limit': STAT_ROW_LIMIT,
+        }
+        with query_timer():
+            results = _run_batch(session, queries, params)
+        own_query_id = results.pop('own_query_id')
+        if own_query_id is not None:
+            self._own_queryids.add(own_query_id)
+        return results
+    
+    def _run_collector_queries(self, session: Session,
+                               groups: Dict[str, Dict[str, str]]) -> Tuple[Dict[str, list], Dict[str, Exception]]:
+        """Run every query of the given groups in one batch, falling back to one batch per group
+        
+        Groups that failed before are kept out of the combined batch and run on
+        their own, so one broken view doesn't fail the batch every cycle.
+        """
+        # Groups with no queries (e.g. query_performance without
+        # pg_stat_statements) have nothing to send
+        groups = {group: queries for group, queries in groups.items() if queries}
+        healthy = {group: queries for group, queries in groups.items()
+                   if group not in self._failed_collectors}
+        results, errors = {}, {}
+        
+        if healthy:
+            try:
+                all_queries = {
+                    name: sql
+                    for queries in healthy.values()
+                    for name, sql in queries.items()
+                }
+                results.update(self._execute_batch(session, all_queries))
+            except Exception as e:
+                # One failing view aborts the whole batch, so retry per collector
+                # to keep the other sections and find the one that broke it
+                logger.warning(f"Batched metrics query failed, retrying per collector: {e}")
+                fallback_results, fallback_errors = self._run_groups_separately(healthy)
+                results.update(fallback_results)
+                errors.update(fallback_errors)
+                self._failed_collectors.update(fallback_errors)
+        
+        # Known-bad groups get one attempt each on the (autocommit) session; a
+        # group that succeeds again rejoins the combined batch next cycle
+        for group, queries in groups.items():
+            if group in healthy:
+                continue
+            try:
+                results.update(self._execute_batch(session, queries))
+                self._failed_collectors.discard(group)
+            except Exception as e:
+                errors[group] = e
+        
+        return results, errors
+    
+    def _run_groups_separately(self, groups: Dict[str, Dict[str, str]]) -> Tuple[Dict[str, list], Dict[str, Exception]]:
+        """Run each group as its own batch, concurrently on pooled connections"""
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=COLLECTOR_WORKERS) as executor:
+            futures = {
+                executor.submit(self._run_group_in_own_session, queries): group
+                for group, queries in groups.items()
             }
-            
-        except Exception as e:
-            logger.error(f"Failed to get lock statistics: {e}")
-            return {'error': str(e)}
+            for future in as_completed(futures):
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    errors[futures[future]] = e
+        return results, errors
     
-    def _get_disk_usage(self, session: Session) -> Dict[str, Any]:
-        """Get database disk usage statistics"""
-        try:
-            # Database size
-            db_size = session.execute(text("""
-                SELECT pg_size_pretty(pg_database_size(current_database())) as size,
-                       pg_database_size(current_database()) as size_bytes
-            """)).fetchone()
-            
-            # Tablespace usage
-            tablespace_usage = session.execute(text("""
-                SELECT 
-                    spcname as tablespace,
-                    pg_tablespace_location(oid) as location,
-                    pg_size_pretty(pg_tablespace_size(spcname)) as size
-                FROM pg_tablespace
-            """)).fetchall()
-            
-            # Top 10 largest tables
-            largest_tables = session.execute(text("""
-                SELECT 
-                    schemaname||'.'||tablename as table_name,
-                    pg_size_pretty(pg_total_relation_size(schemaname||'.'||tablename)) as size,
-                    pg_total_relation_size(schemaname||'.'||tablename) as size_bytes
-                FROM pg_stat_user_tables 
-                ORDER BY pg_total_relation_size(schemaname||'.'||tablename) DESC
-                LIMIT 10
-            """)).fetchall()
+    def _run_group_in_own_session(self, queries: Dict[str, str]) -> Dict[str, list]:
+        """Run one collector's batch on a short-lived session of its own"""
+        with get_db_session() as session:
+            session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
+            return self._execute_batch(session, queries)
+    
+    def _refresh_statement_details(self, session: Session, results: Dict[str, list]):
+        """Fetch full pg_stat_statements rows only for fingerprints whose calls changed"""
+        reset = results['pgss_reset'][0]['stats_reset'] if results['pgss_reset'] else None
+        if reset != self._pgss_last_reset:
+            # pg_stat_statements_reset() was called; cached calls no longer compare
+            self._pgss_calls_cache.clear()
+            self._pgss_details.clear()
+            self._pgss_last_reset = reset
+        
+        top = results['top_statements']
+        changed = [row['queryid'] for row in top
+                   if self._pgss_calls_cache.get(row['queryid']) != row['calls']]
+        if changed:
+            for row in self._fetch_statement_rows(session, STATEMENT_DETAILS_SQL, changed):
+                self._pgss_details[row['queryid']] = row
             
+            texts = self._query_texts
+            missing = [queryid for queryid in changed if queryid not in texts]
+            if missing:
+                for row in self._fetch_statement_rows(session, QUERY_TEXT_SQL, missing):
+                    texts[row['queryid']] = row['query_sample']
+            for queryid in changed:
+                if queryid in texts:
+                    texts.move_to_end(queryid)
+                if queryid in self._pgss_details:
+                    self._pgss_details[queryid]['query_sample'] = texts.get(queryid)
+            while len(texts) > QUERY_TEXT_CACHE_SIZE:
+                texts.popitem(last=False)
+        
+        self._pgss_calls_cache = {row['queryid']: row['calls'] for row in top}
+        self._pgss_details = {
+            queryid: details for queryid, details in self._pgss_details.items()
+            if queryid in self._pgss_calls_cache
+        }
+    
+    def _fetch_statement_rows(self, session: Session, statement: TextClause, queryids: List[int]) -> List[Dict[str, Any]]:
+        """Look up pg_stat_statements rows by queryid, noting the lookup's own queryid"""
+        rows = []
+        params = {'ids': _pg_array(queryids), 'dboid': self._dboid}
+        for row in session.execute(statement, params).mappings():
+            row = dict(row)
+            own_query_id = row.pop('own_query_id')
+            if own_query_id is not None:
+                self._own_queryids.add(own_query_id)
+            rows.append(row)
+        return rows
+    
+    def _collector_error(self, collector: str, error: Exception) -> Any:
+        """Build the error placeholder for a failed collector"""
+        logger.error(f"Failed to get {collector.replace('_', ' ')}: {error}")
+        if collector == 'table_statistics':
+            return [{'error': str(error)}]
+        if collector == 'replication_stats':
+            return {'is_primary': None, 'error': str(error)}
+        return {'error': str(error)}
+    
+    def _parse_connection_stats(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse database connection statistics"""
+        states = results['connection_states']
+        connection_stats = {row['state']: {'count': row['count'], 'avg_duration': row['avg_duration']}
+                            for row in states}
+        
+        total_connections = states[0]['total'] if states else 0
+        
+        connection_stats['total_connections'] = total_connections
+        connection_stats['max_connections'] = self._max_connections
+        connection_stats['utilization'] = total_connections / self._max_connections
+        
+        return connection_stats
+    
+    def _parse_query_performance(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse query performance statistics"""
+        # Without pg_stat_statements only the running-query fields are filled
+        top = results.get('top_statements', [])
+        # Queries taking more than 1 second total
+        slow_queries = self._ranked_statements(
+            [row for row in top if row['total_exec_time'] > 1000], 'rn_time'
+        )
+        
+        return {
+            'slow_queries': slow_queries,
+            'most_called_queries': self._ranked_statements(top, 'rn_calls'),
+            'most_io_queries': self._ranked_statements(top, 'rn_io'),
+            **self._parse_active_queries(results),
+            'total_queries_analyzed': len(slow_queries)
+        }
+    
+    def _parse_active_queries(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse currently running query counts and over-threshold rows"""
+        return {
+            'active_slow_query_count': results['active_slow_query_count'][0]['count'],
+            'long_running_queries': results['long_running_queries'],
+        }
+    
+    def _ranked_statements(self, top: List[Dict[str, Any]], rank: str) -> List[Dict[str, Any]]:
+        """Build the top-10 metrics list for one ranking column"""
+        query_metrics = []
+        for top_row in sorted((r for r in top if r[rank] <= 10), key=lambda r: r[rank]):
+            row = self._pgss_details.get(top_row['queryid'])
+            if row is None:
+                continue
+            # Same fields as QueryPerformanceMetric, built as a dict directly
+            query_metrics.append({
+                'query': row['query_sample'],
+                'total_time': row['total_exec_time'],
+                'calls': row['calls'],
+                'mean_time': row['mean_exec_time'],
+                'max_time': row['max_exec_time'],
+                'min_time': row['min_exec_time'],
+            })
+        return query_metrics
+    
+    def _parse_table_statistics(self, results: Dict[str, list]) -> List[Dict[str, Any]]:
+        """Parse table usage statistics"""
+        # Same fields as TableStatistic, built as dicts directly
+        table_stats = [{
+            'table_name': f"{row['schemaname']}.{row['tablename']}",
+            'row_count': row['row_count'] or 0,
+            'table_size': row['table_size'] or 0,
+            'index_size': row['index_size'] or 0,
+            'total_size': row['total_size'] or 0,
+            'seq_scan': row['seq_scan'] or 0,
+            'seq_tup_read': row['seq_tup_read'] or 0,
+            'idx_scan': row['idx_scan'] or 0,
+            'idx_tup_fetch': row['idx_tup_fetch'] or 0,
+        } for row in results['table_statistics']]
+        
+        return table_stats
+    
+    def _parse_index_statistics(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse index usage statistics"""
+        return {
+            'index_usage': results['index_usage'],
+            'unused_indexes': results['unused_indexes'],
+            'total_indexes': results['index_count'][0]['count']
+        }
+    
+    def _parse_cache_statistics(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse database cache statistics"""
+        rows = {row['kind']: row for row in results['cache_counters']}
+        heap, index = rows['heap'], rows['index']
+        
+        return {
+            'heap_blocks_read': heap['blks_read'] or 0,
+            'heap_blocks_hit': heap['blks_hit'] or 0,
+            'cache_hit_ratio': _hit_ratio(heap),
+            'index_hit_ratio': _hit_ratio(index),
+            'shared_buffers': rows['shared_buffers']['setting'],
+            'effective_cache_size': rows['effective_cache_size']['setting']
+        }
+    
+    def _parse_lock_statistics(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse database lock statistics"""
+        return {
+            'lock_counts': results['lock_counts'],
+            'waiting_locks': results['waiting_locks'],
+            'waiting_lock_count': results['waiting_lock_count'][0]['count'],
+            'blocking_queries': results['blocking_queries'],
+            # Accumulated wait samples rather than the locks held at this instant
+            'wait_event_profile': results.get('wait_event_profile'),
+        }
+    
+    def _parse_disk_usage(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse database disk usage statistics"""
+        db_size = results['database_size'][0]
+        
+        return {
+            'database_size': db_size['size'],
+            'database_size_bytes': db_size['size_bytes'],
+            'tablespace_usage': results['tablespace_usage'],
+            'largest_tables': results['largest_tables']
+        }
+    
+    def _parse_replication_stats(self, results: Dict[str, list]) -> Dict[str, Any]:
+        """Parse replication statistics (if applicable)"""
+        if results['is_primary'][0]['is_primary']:
             return {
-                'database_size': db_size.size,
-                'database_size_bytes': db_size.size_bytes,
-                'tablespace_usage': [dict(row) for row in tablespace_usage],
-                'largest_tables': [dict(row) for row in largest_tables]
+                'is_primary': True,
+                'replication_slots': results['replication_slots'],
+                'wal_senders': results['wal_senders']
             }
-            
-        except Exception as e:
-            logger.error(f"Failed to get disk usage: {e}")
-            return {'error': str(e)}
-    
-    def _get_replication_stats(self, session: Session) -> Dict[str, Any]:
-        """Get replication statistics (if applicable)"""
-        try:
-            # Check if this is a primary server
-            is_primary = session.execute(text("SELECT NOT pg_is_in_recovery()")).scalar()
-            
-            if is_primary:
-                # Get replication slot information
-                replication_slots = session.execute(text("""
-                    SELECT 
-                        slot_name,
-                        plugin,
-                        slot_type,
-                        datoid,
-                        active,
-                        restart_lsn,
-                        confirmed_flush_lsn
-                    FROM pg_replication_slots
-                """)).fetchall()
-                
-                # Get WAL sender information
-                wal_senders = session.execute(text("""
-                    SELECT 
-                        pid,
-                        state,
-                        sent_lsn,
-                        write_lsn,
-                        flush_lsn,
-                        replay_lsn,
-                        write_lag,
-                        flush_lag,
-                        replay_lag
-                    FROM pg_stat_replication
-                """)).fetchall()
-                
-                return {
-                    'is_primary': True,
-                    'replication_slots': [dict(row) for row in replication_slots],
-                    'wal_senders': [dict(row) for row in wal_senders]
-                }
-            else:
-                # Get standby information
-                recovery_info = session.execute(text("""
-                    SELECT 
-                        pg_last_wal_receive_lsn() as received_lsn,
-                        pg_last_wal_replay_lsn() as replayed_lsn,
-                        pg_last_xact_replay_timestamp() as last_replay_timestamp
-                """)).fetchone()
-                
-                return {
-                    'is_primary': False,
-                    'recovery_info': dict(recovery_info) if recovery_info else {}
-                }
-                
-        except Exception as e:
-            logger.error(f"Failed to get replication stats: {e}")
-            return {'is_primary': None, 'error': str(e)}
+        
+        recovery_info = results['recovery_info']
+        return {
+            'is_primary': False,
+            'recovery_info': recovery_info[0] if recovery_info else {}
+        }
     
     def check_alerts(self, metrics: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check for alert conditions based on thresholds"""
@@ -480,8 +927,8 @@ class DatabaseMonitor:
             
             # Long running queries alert
             query_perf = metrics.get('query_performance', {})
-            long_queries = [q for q in query_perf.get('active_slow_queries', []) 
-                          if q.get('duration', 0) > self.alert_thresholds['long_running_query_seconds']]
+            # Filtered against the threshold in SQL
+            long_queries = query_perf.get('long_running_queries', [])
             if long_queries:
                 alerts.append({
                     'severity': 'warning',
@@ -492,8 +939,7 @@ class DatabaseMonitor:
             
             # Lock wait alert
             lock_stats = metrics.get('lock_statistics', {})
-            waiting_locks = [lock for lock in lock_stats.get('waiting_locks', [])
-                           if lock.get('wait_time', 0) > self.alert_thresholds['lock_wait_seconds']]
+            waiting_locks = lock_stats.get('waiting_locks', [])
             if waiting_locks:
                 alerts.append({
                     'severity': 'critical',
@@ -535,69 +981,71 @@ class DatabaseMonitor:
     
     def get_performance_trends(self, hours_back: int = 24) -> Dict[str, Any]:
         """Get performance trends over time"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours_back)
-        recent_metrics = [m for m in self.performance_history if m['timestamp'] > cutoff_time]
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+        # Samples are appended in time order, so the window starts at a bisect point
+        ts = self._trend['ts']
+        start = bisect_right(ts, cutoff_time)
         
-        if not recent_metrics:
+        if start == len(ts):
             return {'error': 'No performance history available'}
         
-        trends = {
-            'timespan_hours': hours_back,
-            'data_points': len(recent_metrics),
-            'connection_utilization': [],
-            'cache_hit_ratio': [],
-            'active_queries': [],
-            'database_size': []
-        }
+        timestamps = self._trend['ts_iso'][start:]
         
-        for metric in recent_metrics:
-            timestamp = metric['timestamp'].isoformat()
-            
-            # Connection utilization trend
-            conn_util = metric.get('connection_stats', {}).get('utilization', 0)
-            trends['connection_utilization'].append({
-                'timestamp': timestamp,
-                'value': conn_util
-            })
-            
-            # Cache hit ratio trend
-            cache_ratio = metric.get('cache_statistics', {}).get('cache_hit_ratio', 0)
-            trends['cache_hit_ratio'].append({
-                'timestamp': timestamp,
-                'value': cache_ratio
-            })
-            
-            # Active queries trend
-            active_queries = len(metric.get('query_performance', {}).get('active_slow_queries', []))
-            trends['active_queries'].append({
-                'timestamp': timestamp,
-                'value': active_queries
-            })
-            
-            # Database size trend
-            db_size = metric.get('disk_usage', {}).get('database_size_bytes', 0)
-            trends['database_size'].append({
-                'timestamp': timestamp,
-                'value': db_size
-            })
+        def series(column: str) -> List[Dict[str, Any]]:
+            return [
+                {'timestamp': timestamp, 'value': value}
+                for timestamp, value in zip(timestamps, self._trend[column][start:])
+            ]
         
-        return trends
+        return {
+            'timespan_hours': hours_back,
+            'data_points': len(timestamps),
+            'connection_utilization': series('conn_util'),
+            'cache_hit_ratio': series('cache_hit'),
+            'active_queries': series('active_q'),
+            'database_size': series('db_size')
+        }
 
 
 # Global monitor instance
 db_monitor = DatabaseMonitor()
 
 
+# Running mean and variance of query_timer durations (ns); a query is logged
+# as slow when it is a 4-sigma outlier or takes longer than 5 seconds. The
+# mean is seeded with the first sample and outlier alerts wait for a warm-up
+# count. Every collector batch is timed (see _execute_batch); the lock covers
+# the update, since the per-collector fallback runs batches on worker threads
+_qt_ewma = 0.0
+_qt_var = 0.0
+_qt_samples = 0
+_qt_lock = threading.Lock()
+QUERY_TIMER_ALPHA = 0.02
+QUERY_TIMER_WARMUP = 20
+QUERY_TIMER_HARD_LIMIT_NS = 5_000_000_000
+
+
 @contextmanager
 def query_timer():
     """Context manager for timing database queries"""
-    start_time = time.time()
+    global _qt_ewma, _qt_var, _qt_samples
+    start_ns = time.perf_counter_ns()
     try:
         yield
     finally:
-        duration = time.time() - start_time
-        if duration > 1.0:  # Log queries taking more than 1 second
-            logger.warning(f"Slow query detected: {duration:.2f}s")
+        duration_ns = time.perf_counter_ns() - start_ns
+        with _qt_lock:
+            is_outlier = (_qt_samples >= QUERY_TIMER_WARMUP
+                          and duration_ns > _qt_ewma + 4 * math.sqrt(_qt_var))
+            if _qt_samples == 0:
+                _qt_ewma = float(duration_ns)
+            else:
+                _qt_ewma = (1 - QUERY_TIMER_ALPHA) * _qt_ewma + QUERY_TIMER_ALPHA * duration_ns
+                _qt_var = (1 - QUERY_TIMER_ALPHA) * _qt_var + QUERY_TIMER_ALPHA * (duration_ns - _qt_ewma) ** 2
+            _qt_samples += 1
+        
+        if is_outlier or duration_ns > QUERY_TIMER_HARD_LIMIT_NS:
+            logger.warning("Slow query detected: %.2fs", duration_ns / 1e9)
 
 
 def get_database_monitor() -> DatabaseMonitor:
@@ -7,8 +7,12 @@ Simplified script to run integration tests with proper setup
 import os
 import sys
 import asyncio
+import hashlib
+import shutil
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import logging
 
@@ -19,44 +23,120 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def check_docker_services():
+# Resolve the docker binaries once instead of a PATH search per call
+DOCKER = shutil.which('docker') or 'docker'
+
+def _resolve_compose():
+    """Prefer the `docker compose` plugin, fall back to legacy docker-compose"""
+    try:
+        probe = subprocess.run([DOCKER, 'compose', 'version'], stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if probe.returncode == 0:
+            return [DOCKER, 'compose']
+    except OSError:
+        pass
+    return [shutil.which('docker-compose') or 'docker-compose']
+
+COMPOSE = _resolve_compose()
+
+# Health polling after `docker-compose up -d`
+SERVICE_HEALTH_TIMEOUT = 90.0
+HEALTH_POLL_MIN_DELAY = 0.25
+HEALTH_POLL_MAX_DELAY = 2.0
+
+# How often a running pip install checks whether it should be cancelled
+CANCEL_CHECK_INTERVAL = 0.5
+
+def wait_for_healthy_services(services, cancel=None):
+    """Poll container health until every service is healthy or the deadline passes
+    
+    Setting the optional `cancel` event stops the poll early with False.
+    """
+    cancel = cancel or threading.Event()
+    deadline = time.monotonic() + SERVICE_HEALTH_TIMEOUT
+    delay = HEALTH_POLL_MIN_DELAY
+    last_status = {}
+    
+    while True:
+        # Containers without a healthcheck report their run state instead
+        result = subprocess.run(
+            [DOCKER, 'inspect', '--format',
+             '{{.Name}} {{if .State.Health}}{{.State.Health.Status}}{{else}}{{.State.Status}}{{end}}',
+             *services],
+            stdin=subprocess.DEVNULL, capture_output=True
+        )
+        status = dict.fromkeys(services, 'missing')
+        for line in result.stdout.decode('utf-8', 'replace').splitlines():
+            name, _, state = line.strip().lstrip('/').partition(' ')
+            status[name] = state
+        
+        for service, state in status.items():
+            if last_status.get(service) != state:
+                logger.info(f"Service {service}: {state}")
+        last_status = status
+        
+        if all(state in ('healthy', 'running') for state in status.values()):
+            return True
+        if time.monotonic() >= deadline:
+            unhealthy = [s for s, state in status.items() if state not in ('healthy', 'running')]
+            logger.error(f"Services not healthy after {SERVICE_HEALTH_TIMEOUT:.0f}s: {unhealthy}")
+            return False
+        
+        if cancel.wait(delay):
+            logger.info("Health check cancelled")
+            return False
+        delay = min(delay * 2, HEALTH_POLL_MAX_DELAY)
+
+def check_docker_services(cancel=None):
     """Check if required Docker services are running"""
     
-    required_services = [
-        'mdus_postgres',
-        'mdus_redis', 
-        'mdus_api_backend'
-    ]
+    # Container name -> compose service name
+    required_services = {
+        'mdus_postgres': 'postgres',
+        'mdus_redis': 'redis',
+        'mdus_api_backend': 'api_backend'
+    }
     
     try:
-        # Check if docker is available
-        result = subprocess.run(['docker', 'ps'], capture_output=True, text=True)
+        # Let the daemon filter down to our container names
+        result = subprocess.run(
+            [DOCKER, 'ps', '--filter', 'name=^mdus_', '--format', '{{.Names}}'],
+            stdin=subprocess.DEVNULL, capture_output=True
+        )
         if result.returncode != 0:
             logger.error("Docker is not running or accessible")
             return False
         
-        running_containers = result.stdout
+        running_containers = set(result.stdout.decode('utf-8', 'replace').split())
         
         # Check each required service
-        missing_services = []
-        for service in required_services:
-            if service not in running_containers:
-                missing_services.append(service)
+        missing_services = [s for s in required_services if s not in running_containers]
         
         if missing_services:
             logger.warning(f"Missing Docker services: {missing_services}")
-            logger.info("Starting Docker services with docker-compose...")
+            start_result = None
+            if len(missing_services) < len(required_services):
+                # Only some containers are down: restart just those and skip
+                # re-evaluating the whole compose graph
+                logger.info("Restarting stopped Docker services with compose start...")
+                start_result = subprocess.run(
+                    [*COMPOSE, 'start', *(required_services[s] for s in missing_services)],
+                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+                )
             
-            # Try to start services
-            start_result = subprocess.run(['docker-compose', 'up', '-d'], 
-                                        capture_output=True, text=True)
+            # Nothing running yet, or the containers no longer exist
+            if start_result is None or start_result.returncode != 0:
+                logger.info("Starting Docker services with docker-compose...")
+                start_result = subprocess.run([*COMPOSE, 'up', '-d'], stdin=subprocess.DEVNULL,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
             if start_result.returncode != 0:
-                logger.error(f"Failed to start services: {start_result.stderr}")
+                logger.error(f"Failed to start services: {start_result.stderr.decode('utf-8', 'replace')}")
                 return False
             
-            # Wait for services to start
-            logger.info("Waiting for services to start...")
-            time.sleep(30)
+            # Wait for services to report healthy
+            logger.info("Waiting for services to become healthy...")
+            if not wait_for_healthy_services(list(required_services), cancel):
+                return False
         
         logger.info("All required Docker services are running")
         return True
@@ -65,8 +145,11 @@ def check_docker_services():
         logger.error(f"Failed to check Docker services: {e}")
         return False
 
-def install_test_dependencies():
-    """Install test dependencies if not already installed"""
+def install_test_dependencies(cancel=None):
+    """Install test dependencies if not already installed
+    
+    Setting the optional `cancel` event terminates a running pip install.
+    """
     
     requirements_file = Path("tests/integration/requirements.txt")
     
@@ -74,16 +157,43 @@ def install_test_dependencies():
         logger.error(f"Requirements file not found: {requirements_file}")
         return False
     
+    # A stamp named after the requirements hash marks this environment as
+    # already provisioned, so warm runs skip pip entirely
+    digest = hashlib.sha256(requirements_file.read_bytes()).hexdigest()
+    stamp_file = Path(sys.prefix) / f".mdus_deps_{digest}"
+    if stamp_file.exists():
+        logger.info("Test dependencies already installed")
+        return True
+    
     try:
         logger.info("Installing test dependencies...")
-        result = subprocess.run([
-            sys.executable, '-m', 'pip', 'install', '-r', str(requirements_file)
-        ], capture_output=True, text=True)
+        process = subprocess.Popen([
+            sys.executable, '-m', 'pip', 'install',
+            '--no-compile', '--prefer-binary', '--disable-pip-version-check',
+            '-r', str(requirements_file)
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         
-        if result.returncode != 0:
-            logger.error(f"Failed to install dependencies: {result.stderr}")
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=CANCEL_CHECK_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    # No stamp is written, so the next run installs again
+                    process.terminate()
+                    process.wait()
+                    logger.info("Dependency installation cancelled")
+                    return False
+        
+        if process.returncode != 0:
+            logger.error(f"Failed to install dependencies: {stderr.decode('utf-8', 'replace')}")
             return False
         
+        try:
+            stamp_file.touch()
+        except OSError as e:
+            logger.warning(f"Could not record installed dependencies: {e}")
+        
         logger.info("Test dependencies installed successfully")
         return True
         
@@ -100,22 +210,23 @@ def create_reports_directory():
 async def run_integration_tests():
     """Run the integration tests"""
     
-    # Change to integration test directory
-    test_dir = Path("tests/integration")
+    test_dir = Path("tests/integration").resolve()
     if not test_dir.exists():
         logger.error(f"Integration test directory not found: {test_dir}")
         return False
     
-    os.chdir(test_dir)
+    # Make the runner importable without changing the process CWD
+    if str(test_dir) not in sys.path:
+        sys.path.insert(0, str(test_dir))
     
     try:
         # Import and run the test runner
-        from test_runner import IntegrationTestRunner, TestExecutionConfig
+        from test_runner import IntegrationTestRunner, TestExecutionConfig, DEFAULT_PARALLEL_WORKERS
         
         # Configure test execution
         config = TestExecutionConfig(
             test_types=['integration', 'e2e', 'performance'],
-            parallel_workers=2,  # Conservative for stability
+            parallel_workers=DEFAULT_PARALLEL_WORKERS,  # MDUS_TEST_WORKERS overrides
             generate_reports=True,
             statistical_analysis=True,
             performance_thresholds={
@@ -128,36 +239,40 @@ async def run_integration_tests():
         )
         
         # Create and run test runner
-        runner = IntegrationTestRunner(config)
+        runner = IntegrationTestRunner(config, base_dir=test_dir)
         results = await runner.run_tests()
         
-        # Print results summary
-        print("\\n" + "="*80)
-        print("MDUS INTEGRATION TEST RESULTS")
-        print("="*80)
-        
+        # Build the results summary and emit it in a single write
         total_tests = len(results)
         successful_tests = sum(1 for r in results.values() if r.get('success'))
         success_rate = successful_tests / total_tests if total_tests > 0 else 0
         
-        print(f"Test Categories: {total_tests}")
-        print(f"Successful: {successful_tests}")
-        print(f"Failed: {total_tests - successful_tests}")
-        print(f"Success Rate: {success_rate:.1%}")
-        
-        print("\\nDetailed Results:")
+        lines = [
+            "",
+            "="*80,
+            "MDUS INTEGRATION TEST RESULTS",
+            "="*80,
+            f"Test Categories: {total_tests}",
+            f"Successful: {successful_tests}",
+            f"Failed: {total_tests - successful_tests}",
+            f"Success Rate: {success_rate:.1%}",
+            "",
+            "Detailed Results:",
+        ]
         for test_type, result in results.items():
             status = "✓ PASS" if result.get('success') else "✗ FAIL"
             duration = result.get('duration', 0)
-            print(f"  {test_type}: {status} ({duration:.2f}s)")
+            lines.append(f"  {test_type}: {status} ({duration:.2f}s)")
         
-        print("\\nGenerated Reports:")
-        reports_dir = Path("reports")
+        lines += ["", "Generated Reports:"]
+        reports_dir = runner.reports_dir
         if reports_dir.exists():
-            for report_file in reports_dir.glob("*"):
-                print(f"  - {report_file.name}")
+            with os.scandir(reports_dir) as entries:
+                lines.extend(f"  - {entry.name}" for entry in entries)
         
-        print("="*80)
+        lines.append("="*80)
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
         
         return success_rate >= 0.8  # Consider successful if 80%+ pass
         
@@ -171,39 +286,45 @@ def main():
     print("MDUS Integration Test Setup and Execution")
     print("="*50)
     
-    # Step 1: Check Docker services
+    # Steps 1 and 2 are both I/O bound, so container startup overlaps with pip
     print("1. Checking Docker services...")
-    if not check_docker_services():
-        print("❌ Docker services check failed")
-        return 1
-    print("✅ Docker services ready")
-    
-    # Step 2: Install dependencies
-    print("\\n2. Installing test dependencies...")
-    if not install_test_dependencies():
-        print("❌ Dependency installation failed")
-        return 1
-    print("✅ Test dependencies ready")
+    print("2. Installing test dependencies...")
+    steps = {
+        check_docker_services: ("✅ Docker services ready", "❌ Docker services check failed"),
+        install_test_dependencies: ("✅ Test dependencies ready", "❌ Dependency installation failed"),
+    }
+    # When one step fails the other is cancelled (pip is terminated, the
+    # health poll stops), so leaving the pool doesn't wait for it to finish
+    cancel = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {executor.submit(step, cancel): step for step in steps}
+        for future in as_completed(futures):
+            ready_message, failed_message = steps[futures[future]]
+            if not future.result():
+                print(failed_message)
+                cancel.set()
+                return 1
+            print(ready_message)
     
     # Step 3: Create reports directory
-    print("\\n3. Setting up reports directory...")
+    print("\n3. Setting up reports directory...")
     create_reports_directory()
     print("✅ Reports directory ready")
     
     # Step 4: Run tests
-    print("\\n4. Running integration tests...")
+    print("\n4. Running integration tests...")
     success = asyncio.run(run_integration_tests())
     
     if success:
-        print("\\n✅ Integration tests completed successfully!")
-        print("\\nNext steps:")
+        print("\n✅ Integration tests completed successfully!")
+        print("\nNext steps:")
         print("- Review generated reports in tests/integration/reports/")
         print("- Check integration_test_summary.md for executive summary")
         print("- Address any failures before production deployment")
         return 0
     else:
-        print("\\n❌ Integration tests failed!")
-        print("\\nTroubleshooting:")
+        print("\n❌ Integration tests failed!")
+        print("\nTroubleshooting:")
         print("- Check Docker services are running: docker-compose ps")
         print("- Review logs in tests/integration/integration_tests.log")
         print("- Verify service endpoints are accessible")
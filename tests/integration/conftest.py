@@ -4,6 +4,8 @@ Pytest configuration for comprehensive integration testing with statistical anal
 """
 
 import os
+import math
+import time
 import asyncio
 import pytest
 import docker
@@ -11,8 +13,14 @@ import psutil
 import logging
 from typing import Dict, Any, AsyncGenerator
 from pathlib import Path
-import pandas as pd
+from functools import lru_cache
 import numpy as np
+from scipy import stats as _scipy_stats
+
+try:
+    import uvloop
+except ImportError:  # Windows or uvloop not installed
+    uvloop = None
 from datetime import datetime
 
 # Test configuration
@@ -31,10 +39,13 @@ TEST_CONFIG = {
 # Set random seeds for reproducibility
 np.random.seed(TEST_CONFIG['random_seed'])
 
+# Two-sided z critical value for the configured confidence level
+_Z_CONFIDENCE = _scipy_stats.norm.ppf((1 + TEST_CONFIG['confidence_level']) / 2)
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Create event loop for async tests"""
-    loop = asyncio.new_event_loop()
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     yield loop
     loop.close()
@@ -53,54 +64,120 @@ async def docker_services():
     # Check if services are running
     running_containers = {c.name: c for c in client.containers.list() if c.name in services}
     
-    # Wait for services to be healthy
-    for service_name in services:
-        if service_name in running_containers:
-            container = running_containers[service_name]
-            # Wait for health check to pass
-            for _ in range(30):  # 30 second timeout
-                container.reload()
-                if container.attrs.get('State', {}).get('Health', {}).get('Status') == 'healthy':
-                    break
-                await asyncio.sleep(1)
+    # Poll through the low-level API client: one raw inspect per round over the
+    # client's pooled connection, no Container object rebuilt on each reload
+    api = client.api
+    
+    async def wait_healthy(name):
+        # inspect_container is a blocking call; run it off the loop so containers poll concurrently
+        for _ in range(120):  # 30 second timeout
+            state = (await asyncio.to_thread(api.inspect_container, name)).get('State', {})
+            if state.get('Health', {}).get('Status') == 'healthy':
+                return
+            await asyncio.sleep(0.25)
+    
+    # Wait for services to be healthy; total wait is the slowest service, not the sum
+    async with asyncio.TaskGroup() as tg:
+        for name in running_containers:
+            tg.create_task(wait_healthy(name))
     
     yield running_containers
     
     # Cleanup is handled by docker-compose
 
-@pytest.fixture(scope="session")
-def performance_tracker():
+class RunningStats:
+    """Welford accumulator for streaming mean/variance/min/max"""
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max', '_buf')
+    
+    INITIAL_CAPACITY = 64
+    
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # Raw values are still kept for exact quantiles, in a buffer that
+        # doubles when full instead of a list converted on every read
+        self._buf = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+    
+    def add(self, value: float):
+        if self.n == self._buf.size:
+            grown = np.empty(self.n * 2, dtype=np.float64)
+            grown[:self.n] = self._buf
+            self._buf = grown
+        self._buf[self.n] = value
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+    
+    @property
+    def samples(self) -> np.ndarray:
+        # Zero-copy view of the filled part of the buffer
+        return self._buf[:self.n]
+    
+    @property
+    def std(self) -> float:
+        # Population std, same as np.std
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+SUMMARY_QUANTILES = (0.50, 0.95, 0.99)
+
+def _quantiles(data: np.ndarray, qs) -> np.ndarray:
+    """Linear-interpolated quantiles (np.percentile default) from one partition"""
+    pos = np.asarray(qs) * (data.size - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.ceil(pos).astype(np.intp)
+    # A single quickselect places every needed order statistic
+    part = np.partition(data, np.unique(np.concatenate((lo, hi))))
+    return part[lo] + (part[hi] - part[lo]) * (pos - lo)
+
+class PerformanceTracker:
     """Track performance metrics across tests"""
-    metrics = {
-        'response_times': [],
-        'memory_usage': [],
-        'cpu_usage': [],
-        'error_rates': [],
-        'throughput': []
-    }
+    __slots__ = ('metrics', '_summary')
+    
+    def __init__(self):
+        self.metrics = {
+            'response_times': RunningStats(),
+            'memory_usage': RunningStats(),
+            'cpu_usage': RunningStats(),
+            'error_rates': RunningStats(),
+            'throughput': RunningStats()
+        }
+        # Keyed on the sample count, so a new value naturally misses the cache
+        self._summary = lru_cache(maxsize=32)(self._compute_summary)
+    
+    def add_metric(self, metric_type: str, value: float):
+        if metric_type in self.metrics:
+            self.metrics[metric_type].add(value)
     
-    def add_metric(metric_type: str, value: float):
-        if metric_type in metrics:
-            metrics[metric_type].append(value)
+    def _compute_summary(self, metric_type: str, count: int) -> Dict[str, float]:
+        acc = self.metrics[metric_type]
+        median, p95, p99 = _quantiles(acc.samples, SUMMARY_QUANTILES)
+        return {
+            'mean': acc.mean,
+            'median': median,
+            'std': acc.std,
+            'min': acc.min,
+            'max': acc.max,
+            'p95': p95,
+            'p99': p99,
+            'count': count
+        }
     
-    def get_statistics(metric_type: str) -> Dict[str, float]:
+    def get_statistics(self, metric_type: str) -> Dict[str, float]:
         """Calculate statistical summary for a metric"""
-        if metric_type not in metrics or not metrics[metric_type]:
+        if metric_type not in self.metrics or not self.metrics[metric_type].n:
             return {}
         
-        data = np.array(metrics[metric_type])
-        return {
-            'mean': np.mean(data),
-            'median': np.median(data),
-            'std': np.std(data),
-            'min': np.min(data),
-            'max': np.max(data),
-            'p95': np.percentile(data, 95),
-            'p99': np.percentile(data, 99),
-            'count': len(data)
-        }
+        return dict(self._summary(metric_type, self.metrics[metric_type].n))
     
-    def generate_report() -> Dict[str, Any]:
+    def generate_report(self) -> Dict[str, Any]:
         """Generate comprehensive performance report"""
         report = {
             'timestamp': datetime.now().isoformat(),
@@ -108,38 +185,41 @@ def performance_tracker():
             'metrics': {}
         }
         
-        for metric_type in metrics:
-            report['metrics'][metric_type] = get_statistics(metric_type)
+        for metric_type in self.metrics:
+            report['metrics'][metric_type] = self.get_statistics(metric_type)
         
         return report
-    
-    tracker = type('PerformanceTracker', (), {
-        'add_metric': add_metric,
-        'get_statistics': get_statistics,
-        'generate_report': generate_report,
-        'metrics': metrics
-    })()
-    
-    yield tracker
 
-@pytest.fixture(scope="function")
-def system_monitor():
+class SystemMonitor:
     """Monitor system resources during test execution"""
-    initial_stats = {
-        'memory': psutil.virtual_memory(),
-        'cpu': psutil.cpu_percent(interval=1),
-        'disk': psutil.disk_usage('/'),
-        'network': psutil.net_io_counters()
-    }
+    __slots__ = ('initial_stats', '_disk', '_disk_at')
+    
+    # disk_usage barely moves within a test; re-read at most once a second
+    DISK_USAGE_TTL = 1.0
+    
+    def __init__(self):
+        self._disk = None
+        self._disk_at = 0.0
+        # Prime the CPU counter so later interval=None reads are non-blocking
+        psutil.cpu_percent(interval=None)
+        self.initial_stats = self.get_current_stats()
     
-    def get_current_stats():
+    def _disk_usage(self):
+        now = time.monotonic()
+        if self._disk is None or now - self._disk_at >= self.DISK_USAGE_TTL:
+            self._disk = psutil.disk_usage('/')
+            self._disk_at = now
+        return self._disk
+    
+    def get_current_stats(self):
         return {
             'memory': psutil.virtual_memory(),
-            'cpu': psutil.cpu_percent(),
-            'disk': psutil.disk_usage('/'),
-            'network': psutil.net_io_counters()
+            'cpu': psutil.cpu_percent(interval=None),
+            'disk': self._disk_usage(),
+            'network': psutil.net_io_counters(pernic=False)
         }
     
+    @staticmethod
     def calculate_usage_diff(start_stats, end_stats):
         """Calculate resource usage difference"""
         return {
@@ -148,32 +228,28 @@ def system_monitor():
             'network_sent_diff': end_stats['network'].bytes_sent - start_stats['network'].bytes_sent,
             'network_recv_diff': end_stats['network'].bytes_recv - start_stats['network'].bytes_recv
         }
-    
-    monitor = type('SystemMonitor', (), {
-        'initial_stats': initial_stats,
-        'get_current_stats': get_current_stats,
-        'calculate_usage_diff': calculate_usage_diff
-    })()
-    
-    yield monitor
 
-@pytest.fixture(scope="function")
-def statistical_validator():
+class StatisticalValidator:
     """Statistical validation utilities"""
-    from scipy import stats
+    __slots__ = ()
     
-    def validate_performance(samples: list, threshold: float, test_type: str = 'mean') -> Dict[str, Any]:
+    def validate_performance(self, samples: list, threshold: float, test_type: str = 'mean') -> Dict[str, Any]:
         """Validate performance against threshold with statistical significance"""
         if not samples:
             return {'valid': False, 'reason': 'No samples provided'}
         
-        data = np.array(samples)
+        # One pass for the moments, reused by the t-test and the CI below
+        data = np.asarray(samples, dtype=np.float64)
+        n = data.size
+        mean = data.mean()
+        sem = math.sqrt(data.var(ddof=1) / n) if n > 1 else float('nan')
         
         if test_type == 'mean':
-            statistic, p_value = stats.ttest_1samp(data, threshold)
+            statistic = (mean - threshold) / sem
+            p_value = 2 * _scipy_stats.t.sf(abs(statistic), n - 1)
             result = {
-                'valid': np.mean(data) <= threshold,
-                'mean': np.mean(data),
+                'valid': mean <= threshold,
+                'mean': mean,
                 'threshold': threshold,
                 'p_value': p_value,
                 'statistic': statistic,
@@ -189,26 +265,25 @@ def statistical_validator():
             }
         
         # Add confidence interval
-        confidence_level = TEST_CONFIG['confidence_level']
-        margin_error = stats.norm.ppf((1 + confidence_level) / 2) * stats.sem(data)
+        margin_error = _Z_CONFIDENCE * sem
         result['confidence_interval'] = {
-            'lower': np.mean(data) - margin_error,
-            'upper': np.mean(data) + margin_error,
-            'level': confidence_level
+            'lower': mean - margin_error,
+            'upper': mean + margin_error,
+            'level': TEST_CONFIG['confidence_level']
         }
         
         return result
     
-    def compare_distributions(sample1: list, sample2: list) -> Dict[str, Any]:
+    def compare_distributions(self, sample1: list, sample2: list) -> Dict[str, Any]:
         """Compare two performance distributions"""
         if not sample1 or not sample2:
             return {'valid': False, 'reason': 'Insufficient samples'}
         
         # Kolmogorov-Smirnov test for distribution comparison
-        ks_stat, ks_p = stats.ks_2samp(sample1, sample2)
+        ks_stat, ks_p = _scipy_stats.ks_2samp(sample1, sample2)
         
         # Mann-Whitney U test for median comparison
-        mw_stat, mw_p = stats.mannwhitneyu(sample1, sample2, alternative='two-sided')
+        mw_stat, mw_p = _scipy_stats.mannwhitneyu(sample1, sample2, alternative='two-sided')
         
         return {
             'ks_test': {'statistic': ks_stat, 'p_value': ks_p},
@@ -224,32 +299,32 @@ def statistical_validator():
                 'std': np.std(sample2)
             }
         }
-    
-    validator = type('StatisticalValidator', (), {
-        'validate_performance': validate_performance,
-        'compare_distributions': compare_distributions
-    })()
-    
-    yield validator
+
+@pytest.fixture(scope="session")
+def performance_tracker():
+    """Track performance metrics across tests"""
+    yield PerformanceTracker()
+
+@pytest.fixture(scope="function")
+def system_monitor():
+    """Monitor system resources during test execution"""
+    yield SystemMonitor()
+
+@pytest.fixture(scope="function")
+def statistical_validator():
+    """Statistical validation utilities"""
+    yield StatisticalValidator()
 
 # Configure logging for tests
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('integration_tests.log'),
+        logging.FileHandler(Path(__file__).parent / 'integration_tests.log'),
         logging.StreamHandler()
     ]
 )
 
-def pytest_configure(config):
-    """Configure pytest with custom markers"""
-    config.addinivalue_line("markers", "integration: Integration tests")
-    config.addinivalue_line("markers", "performance: Performance tests")
-    config.addinivalue_line("markers", "e2e: End-to-end tests")
-    config.addinivalue_line("markers", "stress: Stress tests")
-    config.addinivalue_line("markers", "slow: Slow running tests")
-
 def pytest_html_report_title(report):
     """Customize HTML report title"""
     report.title = "MDUS Integration Test Report"
@@ -0,0 +1,70 @@
+"""
+Database Monitoring Integration Tests
+Runs the monitoring collector queries against the Docker PostgreSQL service
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, declarative_base
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# database.database imports Base from database.models, which is not part of
+# this tree; the collectors never touch the ORM schema (see tests/unit/conftest.py)
+if importlib.util.find_spec('database.models') is None:
+    models = ModuleType('database.models')
+    models.Base = declarative_base()
+    sys.modules['database.models'] = models
+
+from database.monitoring import COLLECTOR_QUERIES, _run_batch
+
+# Throwaway schemas holding a same-named table each; created in a transaction
+# that is rolled back, so nothing is left behind
+TEST_SCHEMAS = ('mdus_monitor_live', 'mdus_monitor_archive')
+
+@pytest.fixture
+def db_session(test_config):
+    """Session on the Docker PostgreSQL service, rolled back after the test"""
+    engine = create_engine(test_config['postgres_url'])
+    with Session(engine) as session:
+        yield session
+        session.rollback()
+    engine.dispose()
+
+@pytest.mark.integration
+class TestDatabaseMonitoring:
+    """Test the monitoring collector queries against a real database"""
+
+    def test_table_statistics_same_name_in_two_schemas(self, db_session):
+        """Same-named tables in two schemas give exactly one row each, sized by their own OID"""
+        for schema in TEST_SCHEMAS:
+            db_session.execute(text(f"CREATE SCHEMA {schema}"))
+            db_session.execute(text(f"CREATE TABLE {schema}.documents (id serial PRIMARY KEY, body text)"))
+        # Only one of the two gets data, so swapped sizes would show up
+        db_session.execute(text(
+            f"INSERT INTO {TEST_SCHEMAS[0]}.documents (body) "
+            f"SELECT repeat('x', 1000) FROM generate_series(1, 100)"
+        ))
+
+        results = _run_batch(db_session, COLLECTOR_QUERIES['table_statistics'],
+                             {'stat_row_limit': 100000})
+        rows = [row for row in results['table_statistics'] if row['schemaname'] in TEST_SCHEMAS]
+
+        assert sorted((row['schemaname'], row['tablename']) for row in rows) == \
+            sorted((schema, 'documents') for schema in TEST_SCHEMAS)
+
+        sizes = {row['schemaname']: row['table_size'] for row in rows}
+        expected = {
+            schema: db_session.execute(
+                text("SELECT pg_relation_size(CAST(:name AS regclass))"),
+                {'name': f"{schema}.documents"}
+            ).scalar()
+            for schema in TEST_SCHEMAS
+        }
+        assert sizes == expected
+        assert sizes[TEST_SCHEMAS[0]] > sizes[TEST_SCHEMAS[1]]
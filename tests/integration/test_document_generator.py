@@ -5,61 +5,164 @@ Generate varied test documents for comprehensive testing
 
 import os
 import json
+import math
 import random
+import statistics
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Tuple
-from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import numpy as np
-import pandas as pd
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to the numpy path
+    njit = None
+
+def _wrap_indices(word_lens: np.ndarray, max_chars: int) -> np.ndarray:
+    """Single-pass line wrap kernel returning the end index of each line"""
+    n = word_lens.shape[0]
+    ends = np.empty(n, dtype=np.int64)
+    count = 0
+    # The first word of a line is always taken, even when it alone is too long
+    line_len = word_lens[0]
+    for i in range(1, n):
+        if line_len + 1 + word_lens[i] <= max_chars:
+            line_len += 1 + word_lens[i]
+        else:
+            ends[count] = i
+            count += 1
+            line_len = word_lens[i]
+    ends[count] = n
+    return ends[:count + 1]
+
+# Compiled once and cached in __pycache__ so later runs skip the JIT
+_wrap_indices_jit = njit(cache=True, nogil=True)(_wrap_indices) if njit else None
+
+def _line_breaks(word_lens: np.ndarray, max_chars: int) -> List[int]:
+    """Return the end index of each line when wrapping words at max_chars"""
+    if _wrap_indices_jit is not None:
+        return _wrap_indices_jit(word_lens, max_chars).tolist()
+    
+    # cum[i] = length of words[:i+1] joined by spaces, plus one trailing space
+    cum = np.cumsum(word_lens + 1)
+    ends = []
+    start = 0
+    while start < len(cum):
+        base = cum[start - 1] if start else 0
+        end = int(np.searchsorted(cum, base + max_chars + 1, side='right'))
+        # A single overlong word still gets a line of its own
+        end = max(end, start + 1)
+        ends.append(end)
+        start = end
+    return ends
+
 class TestDocumentGenerator:
     """Generate test documents with varied characteristics"""
     
+    # Default font shared by every generator call; loaded on first use
+    _font_cache = {}
+    
     def __init__(self, output_dir: str = "test_documents"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.document_metadata = []
-        
-        # Set random seed for reproducible test documents
-        random.seed(42)
-        np.random.seed(42)
+        # Solid background arrays keyed by (width, height, color)
+        self._bg_cache = {}
+        # Rendered text images keyed by every generate_text_image argument
+        self._img_cache = {}
+        
+        # Per-instance seeded generators for reproducible test documents;
+        # the global RNG state is left alone
+        self._rng = np.random.default_rng(42)
+        self._py_rng = random.Random(42)
+    
+    @classmethod
+    def _font(cls):
+        """Return the cached default font, or None if it cannot be loaded"""
+        if 'default' not in cls._font_cache:
+            try:
+                # This will work on most systems
+                cls._font_cache['default'] = ImageFont.load_default()
+            except Exception:
+                cls._font_cache['default'] = None
+        return cls._font_cache['default']
+    
+    def _background(self, width: int, height: int, bg_color: str = 'white') -> np.ndarray:
+        """Return a writable (height, width, 3) copy of a cached solid background"""
+        key = (width, height, bg_color)
+        background = self._bg_cache.get(key)
+        if background is None:
+            background = np.full((height, width, 3), ImageColor.getrgb(bg_color)[:3], dtype=np.uint8)
+            self._bg_cache[key] = background
+        # Drawing mutates the pixels, so callers always get a copy
+        return background.copy()
+    
+    def _preallocate_backgrounds(self, sizes: List[Tuple[int, int]], bg_color: str = 'white'):
+        """Back the cached backgrounds for several sizes with one shared array"""
+        max_w = max(w for w, _ in sizes)
+        max_h = max(h for _, h in sizes)
+        base = np.full((max_h, max_w, 3), ImageColor.getrgb(bg_color)[:3], dtype=np.uint8)
+        for w, h in sizes:
+            # A view of the shared fill; _background's copy makes it contiguous
+            self._bg_cache.setdefault((w, h, bg_color), base[:h, :w])
+    
+    def _make_canvas(self, width: int, height: int, bg_color: str = 'white') -> Image.Image:
+        """Create a solid-color RGB canvas from a cached background array"""
+        return Image.fromarray(self._background(width, height, bg_color), 'RGB')
     
     def generate_text_image(self, text: str, width: int = 800, height: int = 600, 
                            font_size: int = 20, text_color: str = 'black',
                            bg_color: str = 'white') -> Image.Image:
         """Generate an image with text content"""
         
-        image = Image.new('RGB', (width, height), color=bg_color)
+        # Rendering is a pure function of the arguments; callers get a copy
+        # so drawing on the result can't corrupt the cache
+        key = (text, width, height, font_size, text_color, bg_color)
+        cached = self._img_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+        
+        image = self._make_canvas(width, height, bg_color)
         draw = ImageDraw.Draw(image)
         
         # Try to use a default font, fallback to built-in if not available
-        try:
-            # This will work on most systems
-            font = ImageFont.load_default()
-        except Exception:
-            font = None
-        
-        # Split text into lines that fit the image width
-        words = text.split()
-        lines = []
-        current_line = ""
+        font = self._font()
         
-        for word in words:
-            test_line = current_line + " " + word if current_line else word
-            # Estimate text width (approximate)
-            if len(test_line) * (font_size * 0.6) < width - 40:  # 40px margin
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
+        # Split text into lines that fit the image width; ASCII text (all of
+        # the fixture samples) is split and measured as bytes
+        ascii_text = text.isascii()
+        words = text.encode('ascii').split() if ascii_text else text.split()
+        lines = []
         
-        if current_line:
-            lines.append(current_line)
+        if words:
+            # Estimate text width (approximate): longest line, in characters,
+            # whose width stays under the 40px margin
+            char_width = font_size * 0.6
+            max_chars = int((width - 40) / char_width)
+            while max_chars > 0 and max_chars * char_width >= width - 40:
+                max_chars -= 1
+            while (max_chars + 1) * char_width < width - 40:
+                max_chars += 1
+            
+            word_lens = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+            start = 0
+            for end in _line_breaks(word_lens, max_chars):
+                if ascii_text:
+                    lines.append(b' '.join(words[start:end]).decode('ascii'))
+                else:
+                    lines.append(' '.join(words[start:end]))
+                start = end
         
         # Draw text lines
         y_offset = 20
@@ -71,44 +174,52 @@ class TestDocumentGenerator:
             draw.text((20, y_offset), line, fill=text_color, font=font)
             y_offset += line_height
         
-        return image
+        self._img_cache[key] = image
+        return image.copy()
     
     def generate_form_image(self, form_data: Dict[str, str], 
                            width: int = 800, height: int = 600) -> Image.Image:
         """Generate a form-like document image"""
         
-        image = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(image)
+        canvas = self._background(width, height)
+        font = self._font()
         
-        try:
-            font = ImageFont.load_default()
-        except Exception:
-            font = None
+        # Form field layout: one field every 40px from y=80, stopping once the
+        # next field would start below the bottom margin (the first always fits)
+        y_start = 80
+        field_height = 40
+        fields = list(form_data.items())
+        fields = fields[:max(1, (height - 60 - y_start) // field_height + 1)]
+        
+        # Draw all field boxes on the array: top/bottom edges, then left/right edges
+        box_x1, box_x2 = 200, width - 50
+        box_ys = y_start + 20 + np.arange(len(fields)) * field_height
+        edge_rows = np.concatenate((box_ys, box_ys + 25))
+        canvas[edge_rows[edge_rows < height], box_x1:box_x2 + 1] = 0
+        side_rows = (box_ys[:, None] + np.arange(26)).ravel()
+        canvas[side_rows[side_rows < height, None], [box_x1, box_x2]] = 0
+        
+        image = Image.fromarray(canvas, 'RGB')
+        draw = ImageDraw.Draw(image)
         
         # Draw form title
         title = "MEDICAL FORM"
         draw.text((width//2 - 60, 20), title, fill='black', font=font)
         
-        # Draw form fields
-        y_offset = 80
-        field_height = 40
+        if not fields:
+            return image
         
-        for field_name, field_value in form_data.items():
-            # Field label
-            draw.text((50, y_offset), f"{field_name}:", fill='black', font=font)
-            
-            # Field box
-            box_y = y_offset + 20
-            draw.rectangle([(200, box_y), (width-50, box_y+25)], outline='black', width=1)
-            
-            # Field value
+        # Field labels in one multiline call; spacing keeps lines on the 40px grid
+        line_font = font or ImageFont.load_default()
+        spacing = field_height - line_font.getbbox("A")[3]
+        labels = "\n".join(f"{field_name}:" for field_name, _ in fields)
+        draw.multiline_text((50, y_start), labels, fill='black', font=font, spacing=spacing)
+        
+        # Field values
+        draw_text = draw.text
+        for box_y, (_, field_value) in zip(box_ys.tolist(), fields):
             if field_value:
-                draw.text((210, box_y+5), field_value, fill='blue', font=font)
-            
-            y_offset += field_height
-            
-            if y_offset > height - 60:
-                break
+                draw_text((210, box_y+5), field_value, fill='blue', font=font)
         
         return image
     
@@ -116,46 +227,40 @@ class TestDocumentGenerator:
                            width: int = 800, height: int = 600) -> Image.Image:
         """Generate a table-like document image"""
         
-        image = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(image)
-        
-        try:
-            font = ImageFont.load_default()
-        except Exception:
-            font = None
-        
-        if not data:
-            return image
+        canvas = self._background(width, height)
+        font = self._font()
         
         # Calculate table dimensions
         rows = len(data)
         cols = len(data[0]) if data else 0
         
         if rows == 0 or cols == 0:
-            return image
+            return Image.fromarray(canvas, 'RGB')
         
         cell_width = (width - 40) // cols  # 20px margin on each side
         cell_height = min(30, (height - 40) // rows)  # 20px margin top/bottom
         
-        # Draw table
+        # Draw table grid: every cell border in two slice assignments
         start_x, start_y = 20, 20
+        xs = start_x + np.arange(cols + 1) * cell_width
+        ys = start_y + np.arange(rows + 1) * cell_height
+        canvas[ys, start_x:xs[-1] + 1] = 0
+        canvas[start_y:ys[-1] + 1, xs] = 0
         
+        image = Image.fromarray(canvas, 'RGB')
+        draw = ImageDraw.Draw(image)
+        
+        # Draw cell text; bind the bound method once for the nested loop
+        max_chars = cell_width // 8  # Rough estimation
+        draw_text = draw.text
         for row_idx, row_data in enumerate(data):
             for col_idx, cell_data in enumerate(row_data):
-                x1 = start_x + col_idx * cell_width
-                y1 = start_y + row_idx * cell_height
-                x2 = x1 + cell_width
-                y2 = y1 + cell_height
-                
-                # Draw cell border
-                draw.rectangle([(x1, y1), (x2, y2)], outline='black', width=1)
-                
-                # Draw cell text
                 if cell_data:
-                    # Truncate text if too long
-                    max_chars = cell_width // 8  # Rough estimation
-                    display_text = cell_data[:max_chars] if len(cell_data) > max_chars else cell_data
-                    draw.text((x1+5, y1+5), display_text, fill='black', font=font)
+                    # Truncate text if too long (slicing is a no-op for short text)
+                    display_text = cell_data[:max_chars]
+                    x1 = start_x + col_idx * cell_width
+                    y1 = start_y + row_idx * cell_height
+                    draw_text((x1+5, y1+5), display_text, fill='black', font=font)
         
         return image
     
@@ -251,6 +356,9 @@ class TestDocumentGenerator:
             {'size': (800, 400), 'name': 'wide_document'}
         ]
         
+        # One background allocation shared by every variation size
+        self._preallocate_backgrounds([variation['size'] for variation in variations])
+        
         base_text = "MEDICAL DOCUMENT - Size and format variation test. This document tests different dimensions and formats."
         
         for i, variation in enumerate(variations):
@@ -296,31 +404,54 @@ class TestDocumentGenerator:
         
         return documents
     
-    def save_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+    def save_documents(self, documents: List[Dict[str, Any]], fast_mode: bool = False) -> List[str]:
         """Save generated documents to disk and return file paths"""
         
         saved_paths = []
         
-        for doc_info in documents:
-            filename = doc_info['filename']
-            filepath = self.output_dir / filename
+        # fast_mode writes uncompressed BMP for consumers that don't need PNG
+        suffix = '.bmp' if fast_mode else '.png'
+        pending = [
+            (doc_info, (self.output_dir / doc_info['filename']).with_suffix(suffix))
+            for doc_info in documents
+            if isinstance(doc_info['content'], Image.Image)
+        ]
+        
+        def save_image(item) -> int:
+            # Encode in memory and write once; the buffer length is the file size
+            doc_info, filepath = item
+            buffer = BytesIO()
+            if fast_mode:
+                doc_info['content'].save(buffer, format='BMP')
+            else:
+                # Fixtures don't need small files; zlib level 1 is several times cheaper to encode
+                doc_info['content'].save(buffer, format='PNG', compress_level=1, optimize=False)
+            data = buffer.getbuffer()
+            filepath.write_bytes(data)
+            return len(data)
+        
+        # Save images; PNG encoding releases the GIL, so encode across threads
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            file_sizes = list(executor.map(save_image, pending))
+        
+        for (doc_info, filepath), file_size in zip(pending, file_sizes):
+            saved_paths.append(str(filepath))
             
-            # Save image
-            if isinstance(doc_info['content'], Image.Image):
-                doc_info['content'].save(filepath, format='PNG')
-                saved_paths.append(str(filepath))
-                
-                # Save metadata
-                metadata = {k: v for k, v in doc_info.items() if k != 'content'}
-                metadata['filepath'] = str(filepath)
-                metadata['file_size'] = os.path.getsize(filepath)
-                
-                self.document_metadata.append(metadata)
+            # Save metadata
+            metadata = {k: v for k, v in doc_info.items() if k != 'content'}
+            metadata['filename'] = filepath.name
+            metadata['filepath'] = str(filepath)
+            metadata['file_size'] = file_size
+            
+            self.document_metadata.append(metadata)
         
         # Save metadata summary
         metadata_file = self.output_dir / 'document_metadata.json'
-        with open(metadata_file, 'w') as f:
-            json.dump(self.document_metadata, f, indent=2)
+        if orjson is not None:
+            metadata_file.write_bytes(orjson.dumps(self.document_metadata, option=orjson.OPT_INDENT_2))
+        else:
+            with open(metadata_file, 'w') as f:
+                json.dump(self.document_metadata, f, separators=(',', ':'))
         
         logger.info(f"Generated {len(saved_paths)} test documents in {self.output_dir}")
         return saved_paths
@@ -331,42 +462,64 @@ class TestDocumentGenerator:
         if not self.document_metadata:
             return {}
         
-        df = pd.DataFrame(self.document_metadata)
+        # Fold every aggregate in one pass; file size spread uses Welford's
+        # update, which stays stable where sum-of-squares would cancel
+        type_counts = Counter()
+        complexity_counts = Counter()
+        size_n, size_mean, size_m2 = 0, 0.0, 0.0
+        size_min, size_max = None, None
+        text_lengths = []
+        field_counts = []
+        
+        for md in self.document_metadata:
+            type_counts[md['type']] += 1
+            complexity_counts[md['complexity']] += 1
+            
+            file_size = md['file_size']
+            size_n += 1
+            delta = file_size - size_mean
+            size_mean += delta / size_n
+            size_m2 += delta * (file_size - size_mean)
+            size_min = file_size if size_min is None else min(size_min, file_size)
+            size_max = file_size if size_max is None else max(size_max, file_size)
+            
+            if md.get('text_length') is not None:
+                text_lengths.append(md['text_length'])
+            if md.get('field_count') is not None:
+                field_counts.append(md['field_count'])
         
         summary = {
-            'total_documents': len(self.document_metadata),
-            'document_types': df['type'].value_counts().to_dict(),
-            'complexity_distribution': df['complexity'].value_counts().to_dict(),
-            'average_file_size': df['file_size'].mean(),
+            'total_documents': size_n,
+            # most_common() keeps value_counts' descending-count order
+            'document_types': dict(type_counts.most_common()),
+            'complexity_distribution': dict(complexity_counts.most_common()),
+            'average_file_size': size_mean,
             'file_size_range': {
-                'min': df['file_size'].min(),
-                'max': df['file_size'].max(),
-                'std': df['file_size'].std()
+                'min': size_min,
+                'max': size_max,
+                # Sample std (ddof=1), as pandas reported
+                'std': math.sqrt(size_m2 / (size_n - 1)) if size_n > 1 else float('nan')
             }
         }
         
         # Add type-specific statistics
-        if 'text_length' in df.columns:
-            text_docs = df[df['text_length'].notna()]
-            if not text_docs.empty:
-                summary['text_statistics'] = {
-                    'avg_text_length': text_docs['text_length'].mean(),
-                    'text_length_range': {
-                        'min': text_docs['text_length'].min(),
-                        'max': text_docs['text_length'].max()
-                    }
+        if text_lengths:
+            summary['text_statistics'] = {
+                'avg_text_length': statistics.fmean(text_lengths),
+                'text_length_range': {
+                    'min': min(text_lengths),
+                    'max': max(text_lengths)
                 }
+            }
         
-        if 'field_count' in df.columns:
-            form_docs = df[df['field_count'].notna()]
-            if not form_docs.empty:
-                summary['form_statistics'] = {
-                    'avg_field_count': form_docs['field_count'].mean(),
-                    'field_count_range': {
-                        'min': form_docs['field_count'].min(),
-                        'max': form_docs['field_count'].max()
-                    }
+        if field_counts:
+            summary['form_statistics'] = {
+                'avg_field_count': statistics.fmean(field_counts),
+                'field_count_range': {
+                    'min': min(field_counts),
+                    'max': max(field_counts)
                 }
+            }
         
         return summary
 
@@ -7,6 +7,7 @@ import pytest
 import asyncio
 import time
 import json
+import os
 import sys
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -23,17 +24,41 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('integration_test_execution.log'),
+        logging.FileHandler(Path(__file__).parent / 'integration_test_execution.log'),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+# Categories that measure the services themselves; concurrent pytest workers
+# would add load of their own and skew the numbers, so they always run serially
+SERIAL_TEST_TYPES = ('performance', 'stress')
+
+def _parallel_workers_from_env() -> int:
+    """Read the pytest-xdist worker count from MDUS_TEST_WORKERS
+    
+    The integration and e2e tests mostly wait on HTTP, Postgres and Redis,
+    so the default is several workers per CPU.
+    """
+    raw = os.environ.get('MDUS_TEST_WORKERS')
+    if raw is None or not raw.strip():
+        return min(32, (os.cpu_count() or 4) * 4)
+    
+    try:
+        workers = int(raw)
+    except ValueError:
+        raise SystemExit(f"MDUS_TEST_WORKERS must be a positive integer, got {raw!r}")
+    if workers < 1:
+        raise SystemExit(f"MDUS_TEST_WORKERS must be a positive integer, got {raw!r}")
+    return workers
+
+DEFAULT_PARALLEL_WORKERS = _parallel_workers_from_env()
+
 @dataclass
 class TestExecutionConfig:
     """Configuration for test execution"""
     test_types: List[str] = None
-    parallel_workers: int = 4
+    parallel_workers: int = DEFAULT_PARALLEL_WORKERS
     timeout_seconds: int = 3600  # 1 hour
     generate_reports: bool = True
     save_raw_data: bool = True
@@ -56,8 +81,11 @@ class TestExecutionConfig:
 class IntegrationTestRunner:
     """Comprehensive integration test runner with statistical analysis"""
     
-    def __init__(self, config: TestExecutionConfig):
+    def __init__(self, config: TestExecutionConfig, base_dir: Optional[Path] = None):
         self.config = config
+        # All inputs and outputs resolve against base_dir instead of the CWD
+        self.base_dir = Path(base_dir) if base_dir is not None else Path('.')
+        self.reports_dir = self.base_dir / 'reports'
         self.start_time = None
         self.end_time = None
         self.results = {}
@@ -102,7 +130,7 @@ class IntegrationTestRunner:
         # Import and run document generator
         from test_document_generator import create_test_documents
         
-        test_doc_dir = Path("test_documents")
+        test_doc_dir = self.base_dir / "test_documents"
         file_paths, doc_summary = create_test_documents(str(test_doc_dir))
         
         self.test_summary['test_documents'] = {
@@ -123,18 +151,22 @@ class IntegrationTestRunner:
             '-v',  # Verbose output
             '--tb=short',  # Short traceback format
             f'-m {test_type}',  # Run only tests with this marker
-            '--html=integration_test_report.html',  # HTML report
+            f'--rootdir={self.base_dir}',  # Pick up pytest.ini/conftest.py from the test dir
+            f'--html={self.base_dir / "integration_test_report.html"}',  # HTML report
             '--self-contained-html',  # Standalone HTML
-            '--cov=.',  # Coverage report
-            '--cov-report=html',  # HTML coverage report
+            f'--cov={self.base_dir}',  # Coverage report
+            f'--cov-report=html:{self.base_dir / "htmlcov"}',  # HTML coverage report
             '--cov-report=term-missing',  # Terminal coverage report
             f'--maxfail=10',  # Stop after 10 failures
             f'--timeout={self.config.timeout_seconds}',  # Test timeout
         ]
         
         # Add parallel execution if configured
-        if self.config.parallel_workers > 1:
-            pytest_args.extend(['-n', str(self.config.parallel_workers)])
+        workers = 1 if test_type in SERIAL_TEST_TYPES else self.config.parallel_workers
+        if workers > 1:
+            pytest_args.extend(['-n', str(workers)])
+        
+        pytest_args.append(str(self.base_dir))
         
         # Execute tests
         try:
@@ -230,7 +262,7 @@ class IntegrationTestRunner:
                 }
             
             # Save performance report
-            report_path = Path('reports/performance_analysis.json')
+            report_path = self.reports_dir / 'performance_analysis.json'
             report_path.parent.mkdir(exist_ok=True)
             
             with open(report_path, 'w') as f:
@@ -274,7 +306,7 @@ class IntegrationTestRunner:
             }
             
             # Save statistical report
-            report_path = Path('reports/statistical_analysis.json')
+            report_path = self.reports_dir / 'statistical_analysis.json'
             report_path.parent.mkdir(exist_ok=True)
             
             with open(report_path, 'w') as f:
@@ -353,7 +385,7 @@ class IntegrationTestRunner:
                 ]
             
             # Save executive summary
-            report_path = Path('reports/executive_summary.json')
+            report_path = self.reports_dir / 'executive_summary.json'
             report_path.parent.mkdir(exist_ok=True)
             
             with open(report_path, 'w') as f:
@@ -412,7 +444,7 @@ The MDUS (Multi-Document Understanding System) integration testing has been comp
 *This report was generated automatically by the MDUS Integration Testing Framework*
 """
         
-        markdown_path = Path('reports/integration_test_summary.md')
+        markdown_path = self.reports_dir / 'integration_test_summary.md'
         with open(markdown_path, 'w') as f:
             f.write(markdown_content)
         
@@ -436,7 +468,7 @@ The MDUS (Multi-Document Understanding System) integration testing has been comp
                 }
             }
             
-            data_path = Path('reports/raw_test_data.json')
+            data_path = self.reports_dir / 'raw_test_data.json'
             data_path.parent.mkdir(exist_ok=True)
             
             with open(data_path, 'w') as f:
@@ -453,7 +485,6 @@ async def main():
     # Configure test execution
     config = TestExecutionConfig(
         test_types=['integration', 'e2e', 'performance'],
-        parallel_workers=2,  # Reduced for stability
         generate_reports=True,
         statistical_analysis=True
     )
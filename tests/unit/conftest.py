@@ -0,0 +1,20 @@
+"""
+Unit test configuration
+Makes the database package importable without its ORM models module
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+
+from sqlalchemy.orm import declarative_base
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# database.database imports Base from database.models, which is not part of
+# this tree; the unit tests never touch the schema, so an empty Base will do
+if importlib.util.find_spec('database.models') is None:
+    models = ModuleType('database.models')
+    models.Base = declarative_base()
+    sys.modules['database.models'] = models
@@ -0,0 +1,125 @@
+"""
+Database Migration Unit Tests
+Tests for the parallel-group worker path and non-transactional migrations,
+run without a database
+"""
+
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from database import migrate
+from database.migrate import DatabaseMigrator
+
+
+@pytest.fixture
+def migrator(tmp_path):
+    migrator = DatabaseMigrator("postgresql://unused")
+    migrator.migrations_dir = tmp_path
+    return migrator
+
+
+class FakeConnection:
+    """Records each executed statement along with whether a transaction was open"""
+
+    def __init__(self):
+        self.closed = False
+        self.in_transaction = False
+        self.executed = []
+
+    @contextmanager
+    def transaction(self):
+        self.in_transaction = True
+        try:
+            yield
+        finally:
+            self.in_transaction = False
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None, prepare=None):
+        self.executed.append((sql, self.in_transaction))
+
+
+def failing_connect(error):
+    """psycopg.connect replacement that raises the given error"""
+    def connect(*args, **kwargs):
+        raise error
+    return connect
+
+
+class TestParallelWorkers:
+    """Test how worker-thread failures reach _apply_parallel's caller"""
+
+    def test_operational_error_reaches_caller(self, migrator, monkeypatch):
+        """A dropped connection in a worker propagates, so main() can retry"""
+        monkeypatch.setattr(migrate.psycopg, 'connect',
+                            failing_connect(psycopg.OperationalError("server closed the connection")))
+
+        with pytest.raises(psycopg.OperationalError):
+            migrator._apply_parallel(['010_first', '011_second'])
+
+    def test_sql_error_is_reported_as_failure(self, migrator, monkeypatch):
+        """Other database errors are logged and count as a failed migration"""
+        monkeypatch.setattr(migrate.psycopg, 'connect',
+                            failing_connect(psycopg.errors.SyntaxError("syntax error")))
+
+        assert migrator._apply_parallel(['010_first', '011_second']) == [False, False]
+
+
+class TestNonTransactionalMigrations:
+    """Test that CREATE INDEX CONCURRENTLY and friends run outside a transaction"""
+
+    CONCURRENT_SQL = (
+        b"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON documents(a);\n"
+        b"-- @@SPLIT@@\n"
+        b"create unique index concurrently if not exists idx_b ON documents(b);\n"
+    )
+
+    def test_detects_non_transactional_statements(self, migrator):
+        (migrator.migrations_dir / "003_plain.sql").write_bytes(
+            b"BEGIN;\nCREATE INDEX idx_c ON documents(c);\n-- CONCURRENTLY in a comment\nCOMMIT;\n")
+        (migrator.migrations_dir / "004_concurrent.sql").write_bytes(self.CONCURRENT_SQL)
+
+        assert not migrator.is_non_transactional("003_plain")
+        assert migrator.is_non_transactional("004_concurrent")
+
+    def test_runs_parts_in_autocommit_then_records(self, migrator):
+        """Every part runs outside a transaction block and the version is written last"""
+        (migrator.migrations_dir / "004_concurrent.sql").write_bytes(self.CONCURRENT_SQL)
+        conn = FakeConnection()
+
+        assert migrator._apply_and_record(conn, "004_concurrent")
+
+        assert [in_transaction for _, in_transaction in conn.executed] == [False, False, True, True]
+        assert b"idx_a" in conn.executed[0][0] and b"idx_b" in conn.executed[1][0]
+        assert conn.executed[2][0] == "SET LOCAL synchronous_commit = off"
+        assert "schema_migrations" in conn.executed[3][0]
+
+    def test_regular_migration_commits_with_its_record(self, migrator):
+        (migrator.migrations_dir / "003_plain.sql").write_bytes(
+            b"BEGIN;\nCREATE INDEX idx_c ON documents(c);\nCOMMIT;\n")
+        conn = FakeConnection()
+
+        assert migrator._apply_and_record(conn, "003_plain")
+
+        assert [in_transaction for _, in_transaction in conn.executed] == [True, True]
+        assert b"BEGIN" not in conn.executed[0][0]
+        # The record commits with the DDL, so it keeps the durable commit
+        assert not any("synchronous_commit" in str(sql) for sql, _ in conn.executed)
+
+    def test_rejected_in_single_transaction_mode(self, migrator):
+        """Inside the run-wide transaction the file is refused instead of failing in Postgres"""
+        (migrator.migrations_dir / "004_concurrent.sql").write_bytes(self.CONCURRENT_SQL)
+        conn = FakeConnection()
+        migrator._conn = conn
+
+        assert not migrator.apply_migration("004_concurrent", savepoint=True)
+        assert conn.executed == []
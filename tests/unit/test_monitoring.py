@@ -0,0 +1,218 @@
+"""
+Database Monitoring Unit Tests
+Tests for the batched collector queries, run against a stub session
+"""
+
+import copy
+import logging
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from database import monitoring
+from database.monitoring import COLLECTOR_QUERIES, DatabaseMonitor, _batch_statement, query_timer
+
+ALIAS_RE = re.compile(r'\) AS "(\w+)"')
+
+
+class StubSession:
+    """Answers a batch statement with one row holding a column per alias"""
+
+    def __init__(self, failing_sql=(), rows=None):
+        self.failing_sql = failing_sql
+        self.rows = rows or {}
+        self.batches = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        names = ALIAS_RE.findall(sql)
+        self.batches.append(names)
+        if any(fragment in sql for fragment in self.failing_sql):
+            raise RuntimeError("relation does not exist")
+
+        # Fresh rows per call, like the driver's JSON decoding
+        mapping = {name: copy.deepcopy(self.rows.get(name, [{'query': name}])) for name in names}
+        mapping['own_query_id'] = 42
+        row = SimpleNamespace(_mapping=mapping)
+        return SimpleNamespace(one=lambda: row)
+
+
+@pytest.fixture
+def monitor():
+    """Monitor whose per-group fallback sessions are replaced by the stub"""
+    monitor = DatabaseMonitor()
+    monitor.fallback_session = StubSession()
+    monitor._run_group_in_own_session = lambda queries: monitor._execute_batch(monitor.fallback_session, queries)
+    return monitor
+
+
+class TestBatchStatement:
+    """Test building the combined json_agg() statement"""
+
+    def test_each_query_gets_its_own_column(self):
+        """Every named query becomes one quoted column alias, plus own_query_id"""
+        queries = (('first', 'SELECT 1 AS a'), ('second', 'SELECT 2 AS b'))
+        sql = str(_batch_statement(queries))
+
+        assert ALIAS_RE.findall(sql) == ['first', 'second']
+        assert 'FROM (SELECT 1 AS a) q' in sql
+        assert 'FROM (SELECT 2 AS b) q' in sql
+        assert 'AS own_query_id' in sql
+
+    def test_statement_is_reused(self):
+        """The same query set returns the cached statement"""
+        queries = (('first', 'SELECT 1'),)
+        assert _batch_statement(queries) is _batch_statement(queries)
+
+
+class TestTableStatistics:
+    """Test the table_statistics query shape (run for real in tests/integration)"""
+
+    SQL = COLLECTOR_QUERIES['table_statistics']['table_statistics']
+
+    def test_no_name_based_pg_class_join(self):
+        """A relname join on pg_class would multiply same-named tables across schemas"""
+        assert not re.search(r'\bJOIN\s+pg_class\b', self.SQL, re.IGNORECASE)
+        assert not re.search(r'\brelname\s*=|=\s*\w*\.?(relname|tablename)\b', self.SQL, re.IGNORECASE)
+
+    def test_sizes_by_relid(self):
+        """Every size function takes the table's OID, never a schema-less name"""
+        size_args = re.findall(r'pg_(?:total_relation|relation|indexes)_size\((\w+)\)', self.SQL)
+        assert size_args == ['relid', 'relid', 'relid']
+
+
+class TestCollectorFallback:
+    """Test the per-collector fallback when the combined batch fails"""
+
+    GROUPS = {
+        'healthy': {'healthy_query': 'SELECT 1'},
+        'broken': {'broken_query': 'SELECT * FROM missing_view'},
+    }
+
+    def test_failing_group_is_isolated(self, monitor):
+        """A failing view costs only its own group, and the rest still report"""
+        session = StubSession(failing_sql=('missing_view',))
+        monitor.fallback_session = session
+
+        results, errors = monitor._run_collector_queries(session, self.GROUPS)
+
+        assert results == {'healthy_query': [{'query': 'healthy_query'}]}
+        assert set(errors) == {'broken'}
+        assert monitor._failed_collectors == {'broken'}
+        assert 42 in monitor._own_queryids
+
+    def test_failed_group_stays_out_of_the_batch(self, monitor):
+        """Once a group has failed, the combined batch is sent without it"""
+        session = StubSession(failing_sql=('missing_view',))
+        monitor._failed_collectors.add('broken')
+
+        results, errors = monitor._run_collector_queries(session, self.GROUPS)
+
+        assert session.batches == [['healthy_query'], ['broken_query']]
+        assert 'healthy_query' in results
+        assert set(errors) == {'broken'}
+
+    def test_recovered_group_rejoins_the_batch(self, monitor):
+        """A known-bad group that succeeds again is dropped from the failed set"""
+        session = StubSession()
+        monitor._failed_collectors.add('broken')
+
+        results, errors = monitor._run_collector_queries(session, self.GROUPS)
+
+        assert errors == {}
+        assert set(results) == {'healthy_query', 'broken_query'}
+        assert monitor._failed_collectors == set()
+
+    def test_empty_groups_are_not_sent(self, monitor):
+        """Groups without queries (e.g. no pg_stat_statements) never reach the server"""
+        session = StubSession()
+
+        results, errors = monitor._run_collector_queries(session, {'query_performance': {}})
+
+        assert (results, errors) == ({}, {})
+        assert session.batches == []
+
+
+class TestJsonTypes:
+    """Test that values flattened by json_agg() come back with their native types"""
+
+    # Rows as the driver decodes them from the json_agg() columns
+    ROWS = {
+        'is_primary': [{'is_primary': False}],
+        'replication_slots': [],
+        'wal_senders': [{'pid': 7, 'state': 'streaming', 'write_lag': 0.25,
+                         'flush_lag': 0.5, 'replay_lag': None}],
+        'recovery_info': [{'received_lsn': '0/3000060', 'replayed_lsn': '0/3000060',
+                           'last_replay_timestamp': '2026-10-15T09:30:00.123456+00:00'}],
+    }
+
+    def test_batched_and_fallback_paths_agree(self, monitor):
+        """replication_stats has the same values and types on either path"""
+        groups = {'replication_stats': COLLECTOR_QUERIES['replication_stats']}
+        batched, _ = monitor._run_collector_queries(StubSession(rows=self.ROWS), groups)
+
+        session = StubSession(failing_sql=('missing_view',), rows=self.ROWS)
+        monitor.fallback_session = session
+        fallback, errors = monitor._run_collector_queries(
+            session, {**groups, 'broken': {'broken_query': 'SELECT * FROM missing_view'}})
+
+        assert set(errors) == {'broken'}
+        assert fallback == batched
+        assert batched['recovery_info'][0]['last_replay_timestamp'] == \
+            datetime(2026, 10, 15, 9, 30, 0, 123456, tzinfo=timezone.utc)
+        assert batched['wal_senders'][0]['write_lag'] == timedelta(milliseconds=250)
+        assert batched['wal_senders'][0]['replay_lag'] is None
+
+
+class TestQueryTimer:
+    """Test the slow-query thresholds of query_timer"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_stats(self, monkeypatch):
+        """Start every test from an empty running mean and variance"""
+        monkeypatch.setattr(monitoring, '_qt_ewma', 0.0)
+        monkeypatch.setattr(monitoring, '_qt_var', 0.0)
+        monkeypatch.setattr(monitoring, '_qt_samples', 0)
+
+    @staticmethod
+    def timed(monkeypatch, durations_ns):
+        """Run query_timer once per duration against a fake perf_counter_ns"""
+        clock = iter(tick for duration in durations_ns for tick in (0, duration))
+        with monkeypatch.context() as patch:
+            patch.setattr(monitoring.time, 'perf_counter_ns', lambda: next(clock))
+            for _ in durations_ns:
+                with query_timer():
+                    pass
+
+    def slow_warnings(self, caplog):
+        return [r for r in caplog.records if r.getMessage().startswith('Slow query detected')]
+
+    def test_hard_limit_warns_without_history(self, monkeypatch, caplog):
+        """Anything over 5 seconds is slow, even as the very first sample"""
+        with caplog.at_level(logging.WARNING, logger=monitoring.__name__):
+            self.timed(monkeypatch, [6_000_000_000])
+
+        assert [r.getMessage() for r in self.slow_warnings(caplog)] == ['Slow query detected: 6.00s']
+
+    def test_outlier_warns_only_after_warm_up(self, monkeypatch, caplog):
+        """A 10x outlier is ignored during warm-up and flagged once the mean has settled"""
+        warm_up = [10_000_000] * (monitoring.QUERY_TIMER_WARMUP - 1)
+        with caplog.at_level(logging.WARNING, logger=monitoring.__name__):
+            self.timed(monkeypatch, warm_up + [100_000_000])
+            assert self.slow_warnings(caplog) == []
+
+            self.timed(monkeypatch, [10_000_000] * 5 + [100_000_000])
+
+        assert len(self.slow_warnings(caplog)) == 1
+
+    def test_collector_batches_are_timed(self, monitor):
+        """Every batch the collectors send goes through query_timer"""
+        monitor._run_collector_queries(StubSession(), TestCollectorFallback.GROUPS)
+
+        assert monitoring._qt_samples == 1